@@ -12,11 +12,29 @@ RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT", "5672"))
 RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
 RABBITMQ_PASSWORD = os.getenv("RABBITMQ_PASSWORD", "guest")
+# >1 splits documents.discovered into documents.discovered.<n> shards behind an x-consistent-hash
+# exchange keyed on documentId (needs the rabbitmq_consistent_hash_exchange plugin)
+DISCOVERED_SHARD_COUNT = max(1, int(os.getenv("DISCOVERED_SHARD_COUNT", "1")))
+# >0 caps every declared queue at this many messages instead of letting the broker page an unbounded
+# backlog. Once a queue is full the OLDEST message is discarded (drop-head) to make room: publishers
+# don't use confirms, so a rejected publish (reject-publish) would be lost just as silently, and with no
+# trace of which message it was. Only enable this where losing backlog is acceptable; dropped documents
+# have to be re-ingested. Every service that declares a queue passes these arguments (RabbitMQ rejects
+# a redeclaration with different ones), so set it for all services alike. Existing queues must be
+# deleted once to pick it up
+QUEUE_MAX_LENGTH = int(os.getenv("QUEUE_MAX_LENGTH", "0"))
+QUEUE_ARGUMENTS = {"x-max-length": QUEUE_MAX_LENGTH, "x-overflow": "drop-head"} if QUEUE_MAX_LENGTH > 0 else None
 
 
 def get_rabbitmq_broker() -> RabbitMQEventBroker:
     # Create and return a configured RabbitMQ event broker instance.
-    return RabbitMQEventBroker(host=RABBITMQ_HOST, port=RABBITMQ_PORT, username=RABBITMQ_USER, password=RABBITMQ_PASSWORD)
+    return RabbitMQEventBroker(
+        host=RABBITMQ_HOST,
+        port=RABBITMQ_PORT,
+        username=RABBITMQ_USER,
+        password=RABBITMQ_PASSWORD,
+        queue_arguments=QUEUE_ARGUMENTS,
+    )
 
 
 # ============================================================================
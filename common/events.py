@@ -1,5 +1,5 @@
+import time
 import uuid
-from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 
@@ -8,9 +8,20 @@ def generate_event_id() -> str:
     return str(uuid.uuid4())
 
 
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") of the last timestamp, so the date part is formatted once per second
+_timestamp_prefix = (-1, "")
+
+
 def get_utc_timestamp() -> str:
-    # Get current UTC timestamp in ISO 8601 format
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    # Get current UTC timestamp in ISO 8601 format with microseconds, e.g. 2025-01-22T10:30:45.123456Z
+    global _timestamp_prefix
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _timestamp_prefix
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _timestamp_prefix = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1_000_000):06d}Z"
 
 
 def create_document_discovered_event(
@@ -7,7 +7,8 @@ Used by worker processes to report their health status to Docker/Kubernetes.
 Health checks verify:
 - RabbitMQ connection status (broker.connection and broker.channel)
 - Returns 200 (healthy) or 503 (unhealthy)
-- Runs in background thread (daemon=True) so it doesn't block shutdown
+- Runs an asyncio server on a background thread (daemon=True) so it doesn't block shutdown
+- Responses are pre-rendered bytes; a probe costs one read and one write
 
 Usage:
     from common.health import start_health_server
@@ -16,67 +17,91 @@ Usage:
     start_health_server(broker, service_name="my-service", port=8080)
 """
 
+import asyncio
 import json
 import logging
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Optional
+import time
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on how long a client may take to send its request headers
+REQUEST_TIMEOUT_SECONDS = 5.0
+# Probes arriving within this window reuse the last broker check
+PROBE_CACHE_SECONDS = 0.5
 
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    # Class variables set by start_health_server()
-    broker = None
-    service_name = "service"
-
-    def do_GET(self):
-        # Handle GET requests to /health endpoint.
-        if self.path == "/health":
-            # Check if broker is connected
-            is_healthy = (
-                self.broker is not None
-                and self.broker.connection is not None
-                and not self.broker.connection.is_closed
-                and self.broker.channel is not None
-                and self.broker.channel.is_open
-            )
-
-            if is_healthy:
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                response = {"status": "healthy", "service": self.service_name, "rabbitmq": "connected"}
-                self.wfile.write(json.dumps(response).encode())
-            else:
-                self.send_response(503)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                response = {"status": "unhealthy", "service": self.service_name, "rabbitmq": "disconnected"}
-                self.wfile.write(json.dumps(response).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
 
-    def log_message(self, format, *args):
-        # Suppress default HTTP server logging (too noisy).
-        pass
+def _http_response(status: str, body: bytes = b"") -> bytes:
+    # Render a complete HTTP/1.1 response once so probes only write bytes
+    headers = (
+        f"HTTP/1.1 {status}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return headers.encode("ascii") + body
+
+
+def is_broker_healthy(broker) -> bool:
+    # Check if broker is connected
+    return (
+        broker is not None
+        and broker.connection is not None
+        and not broker.connection.is_closed
+        and broker.channel is not None
+        and broker.channel.is_open
+    )
+
 
+def start_health_server(
+    broker, service_name: str = "service", port: int = 8080, probe_cache_seconds: float = PROBE_CACHE_SECONDS
+):
+    healthy = _http_response(
+        "200 OK", json.dumps({"status": "healthy", "service": service_name, "rabbitmq": "connected"}).encode()
+    )
+    unhealthy = _http_response(
+        "503 Service Unavailable",
+        json.dumps({"status": "unhealthy", "service": service_name, "rabbitmq": "disconnected"}).encode(),
+    )
+    not_found = _http_response("404 Not Found")
+    # (monotonic time of last check, response it selected); only touched on the event loop thread
+    last_probe = [float("-inf"), unhealthy]
+
+    def health_response() -> bytes:
+        now = time.monotonic()
+        if now - last_probe[0] >= probe_cache_seconds:
+            last_probe[0] = now
+            last_probe[1] = healthy if is_broker_healthy(broker) else unhealthy
+        return last_probe[1]
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Serve GET /health; anything else is a 404
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT_SECONDS)
+            request_line = request.split(b"\r\n", 1)[0].split(b" ")
+            if len(request_line) >= 2 and request_line[0] == b"GET" and request_line[1] == b"/health":
+                writer.write(health_response())
+            else:
+                writer.write(not_found)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
 
-def start_health_server(broker, service_name: str = "service", port: int = 8080):
-    # Configure the handler with broker and service name
-    HealthCheckHandler.broker = broker
-    HealthCheckHandler.service_name = service_name
+    async def serve():
+        server = await asyncio.start_server(handle, "0.0.0.0", port)
+        logger.info(f"✅ Health check server started on port {port}")
+        async with server:
+            await server.serve_forever()
 
     def run_server():
-        # Background thread function that runs the HTTP server.
+        # Background thread function that runs the event loop.
         try:
-            server = HTTPServer(("0.0.0.0", port), HealthCheckHandler)
-            logger.info(f"✅ Health check server started on port {port}")
-            server.serve_forever()
+            asyncio.run(serve())
         except Exception as e:
             logger.error(f"❌ Failed to start health server: {e}")
 
     # Start server in daemon thread (dies when main process exits)
-    health_thread = threading.Thread(target=run_server, daemon=True)
+    health_thread = threading.Thread(target=run_server, name=f"health-{service_name}", daemon=True)
     health_thread.start()
@@ -8,6 +8,7 @@ Usage:
         name: Logger name (typically __name__ from calling module)
         level: Logging level (default: INFO)
         format_string: Optional custom format string
+        background: Hand records to a QueueListener thread so callers never block on stderr
     returns:
         Configured logger instance
 
@@ -16,17 +17,33 @@ Usage:
         >>> logger.info("✅ Service initialized")
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 from typing import Optional
 
 
-def setup_logging(name: str, level: int = logging.INFO, format_string: Optional[str] = None) -> logging.Logger:
+def setup_logging(
+    name: str, level: int = logging.INFO, format_string: Optional[str] = None, background: bool = False
+) -> logging.Logger:
     if format_string is None:
         format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
     # Only configure root logger once
-    if not logging.getLogger().handlers:
+    root = logging.getLogger()
+    if not root.handlers:
         logging.basicConfig(level=level, format=format_string)
+        if background:
+            # Move the stream handler behind a queue: logging calls only enqueue the record
+            handlers = root.handlers[:]
+            for handler in handlers:
+                root.removeHandler(handler)
+            log_queue = queue.SimpleQueue()
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
 
     # Return logger for the specific module
     logger = logging.getLogger(name)
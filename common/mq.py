@@ -1,6 +1,8 @@
 import json
 import logging
-from typing import Any, Callable, Optional
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
 
 import pika
 
@@ -10,12 +12,27 @@ logger = logging.getLogger(__name__)
 class RabbitMQEventBroker:
     # Event broker implementation using RabbitMQ for publishing and consuming events.
 
-    def __init__(self, host: str = "localhost", port: int = 5672, username: str = "guest", password: str = "guest"):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 5672,
+        username: str = "guest",
+        password: str = "guest",
+        queue_arguments: Optional[Dict[str, Any]] = None,
+    ):
         self.host = host
         self.port = port
+        # x-arguments applied to every queue this broker declares (must match across services)
+        self.queue_arguments = queue_arguments
         self.credentials = pika.PlainCredentials(username, password)
         self.connection: Optional[pika.BlockingConnection] = None
         self.channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+        # Thread running the consumer loop; publishes from other threads are handed over to it
+        self._io_thread_id: Optional[int] = None
+        # Every publish shares these properties, so build them once
+        self._publish_properties = pika.BasicProperties(
+            delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE, content_type="application/json"
+        )
 
         self._connect()
 
@@ -38,41 +55,112 @@ class RabbitMQEventBroker:
         if not self.channel:
             raise RuntimeError("Not connected to RabbitMQ")
 
-        self.channel.queue_declare(queue=queue_name, durable=durable)
+        self.channel.queue_declare(queue=queue_name, durable=durable, arguments=self.queue_arguments)
         logger.info(f"Declared queue: {queue_name}")
 
-    def publish(self, routing_key: str, message: str, exchange: str = "events"):
+    def declare_sharded_queues(
+        self, routing_key: str, shard_count: int, exchange: str = "events", hash_header: str = "documentId"
+    ) -> List[str]:
+        # Spread routing_key over <routing_key>.0..N-1 queues through an x-consistent-hash exchange
+        # fed from `exchange`; messages are placed by the hash of their `hash_header` header
+        if not self.channel:
+            raise RuntimeError("Not connected to RabbitMQ")
+
+        hash_exchange = f"{routing_key}.hash"
+        self.channel.exchange_declare(
+            exchange=hash_exchange,
+            exchange_type="x-consistent-hash",
+            durable=True,
+            arguments={"hash-header": hash_header},
+        )
+        self.channel.exchange_bind(destination=hash_exchange, source=exchange, routing_key=routing_key)
+        queues = []
+        for shard in range(shard_count):
+            queue_name = f"{routing_key}.{shard}"
+            self.declare_queue(queue_name)
+            # For consistent-hash exchanges the binding key is the shard's weight
+            self.channel.queue_bind(exchange=hash_exchange, queue=queue_name, routing_key="1")
+            queues.append(queue_name)
+        return queues
+
+    def publish(
+        self,
+        routing_key: str,
+        message: Union[str, bytes],
+        exchange: str = "events",
+        headers: Optional[Dict[str, Any]] = None,
+    ):
         # Publish a message to an exchange.
         if not self.channel:
             raise RuntimeError("Not connected to RabbitMQ")
+        if self._io_thread_id is not None and threading.get_ident() != self._io_thread_id:
+            return self._publish_threadsafe(routing_key, message, exchange, headers)
+
+        properties = self._publish_properties
+        if headers:
+            properties = pika.BasicProperties(
+                delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE, content_type="application/json", headers=headers
+            )
 
         try:
             self.channel.basic_publish(
                 exchange=exchange,
                 routing_key=routing_key,
                 body=message,
-                properties=pika.BasicProperties(
-                    delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE, content_type="application/json"
-                ),
+                properties=properties,
             )
             logger.info(f"Published message to {exchange}/{routing_key}")
         except Exception as e:
             logger.error(f"Failed to publish message: {str(e)}")
             raise
 
-    def consume(self, queue_name: str, callback: Callable[[Any, Any, Any, bytes], None], auto_ack: bool = False):
+    def _publish_threadsafe(
+        self,
+        routing_key: str,
+        message: Union[str, bytes],
+        exchange: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: float = 30.0,
+    ):
+        # pika connections are not thread-safe: run the publish on the consumer thread and wait for it
+        done = threading.Event()
+        errors = []
+
+        def _publish():
+            try:
+                self.publish(routing_key, message, exchange, headers)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        self.connection.add_callback_threadsafe(_publish)
+        if not done.wait(timeout):
+            raise TimeoutError(f"Timed out publishing to {exchange}/{routing_key}")
+        if errors:
+            raise errors[0]
+
+    def consume(
+        self,
+        queue_name: str,
+        callback: Callable[[Any, Any, Any, bytes], None],
+        auto_ack: bool = False,
+        prefetch_count: int = 1,
+    ):
         """
         queue_name: Queue to consume from
         callback: Callback function (ch, method, properties, body) -> None
         auto_ack: Whether to auto-acknowledge messages
+        prefetch_count: Max unacknowledged messages delivered to this consumer
         """
         if not self.channel:
             raise RuntimeError("Not connected to RabbitMQ")
 
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=prefetch_count)
         self.channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=auto_ack)
 
         logger.info(f"Started consuming from queue: {queue_name}")
+        self._io_thread_id = threading.get_ident()
         self.channel.start_consuming()
 
     def close(self):
@@ -80,3 +168,64 @@ class RabbitMQEventBroker:
         if self.connection and not self.connection.is_closed:
             self.connection.close()
             logger.info("Closed RabbitMQ connection")
+
+
+class AckBatcher:
+    # Coalesces consumer acks into a single basic_ack(multiple=True).
+    # Deliveries may finish out of order (e.g. on a thread pool), so only the contiguous prefix of
+    # settled delivery tags is acked: multiple=True must never cover a message that is still in flight.
+    # Flushes once max_pending acks are ready, after flush_interval seconds, or before any nack,
+    # so delivery stays at-least-once. max_pending should not exceed the channel prefetch_count.
+    # Must be called from the connection's thread (consumer callbacks or add_callback_threadsafe).
+
+    def __init__(self, channel, max_pending: int = 32, flush_interval: float = 0.1):
+        self.channel = channel
+        self.max_pending = max(1, max_pending)
+        self.flush_interval = flush_interval
+        self._in_flight: Deque[int] = deque()
+        self._settled: Dict[int, bool] = {}
+        self._pending = 0
+        self._last_tag: Optional[int] = None
+        self._timer = None
+
+    def track(self, delivery_tag: int):
+        # Register a delivery as soon as it arrives; tags increase monotonically per channel
+        self._in_flight.append(delivery_tag)
+
+    def ack(self, delivery_tag: int):
+        self._settle(delivery_tag, acked=True)
+        if self._pending >= self.max_pending:
+            self.flush()
+        elif self._pending and self._timer is None:
+            self._timer = self.channel.connection.call_later(self.flush_interval, self._on_timer)
+
+    def nack(self, delivery_tag: int, requeue: bool = False):
+        self.flush()
+        self.channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+        self._settle(delivery_tag, acked=False)
+
+    def flush(self):
+        if self._timer is not None:
+            self.channel.connection.remove_timeout(self._timer)
+            self._timer = None
+        if self._pending:
+            self.channel.basic_ack(delivery_tag=self._last_tag, multiple=True)
+            self._pending = 0
+
+    def _settle(self, delivery_tag: int, acked: bool):
+        if delivery_tag not in self._in_flight:
+            # Untracked delivery: settle it on its own
+            if acked:
+                self.channel.basic_ack(delivery_tag=delivery_tag)
+            return
+        self._settled[delivery_tag] = acked
+        # Advance the high-watermark over every settled tag at the head of the window
+        while self._in_flight and self._in_flight[0] in self._settled:
+            tag = self._in_flight.popleft()
+            if self._settled.pop(tag):
+                self._last_tag = tag
+                self._pending += 1
+
+    def _on_timer(self):
+        self._timer = None
+        self.flush()
@@ -16,6 +16,7 @@ from pydantic import BaseModel
 
 # Add common module to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from common.config import QUEUE_ARGUMENTS
 from common.mq import RabbitMQEventBroker
 
 logging.basicConfig(level=logging.INFO)
@@ -348,6 +349,7 @@ def startup_event():
                 port=int(os.getenv("RABBITMQ_PORT", "5672")),
                 username=os.getenv("RABBITMQ_USER", "guest"),
                 password=os.getenv("RABBITMQ_PASS", "guest"),
+                queue_arguments=QUEUE_ARGUMENTS,
             )
 
             queues = [
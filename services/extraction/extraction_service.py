@@ -1,11 +1,18 @@
-import json
+import hashlib
 import logging
 import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import IO, Any, Callable, Dict, Iterator, Optional
 
+import orjson
 import pdfplumber
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import LIT
 
 from common.events import (
     ROUTING_KEY_EXTRACTED,
@@ -16,6 +23,78 @@ from common.events import (
 
 logger = logging.getLogger(__name__)
 
+LITERAL_IMAGE = LIT("Image")
+
+
+def _temp_sibling(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w") -> Iterator[IO]:
+    # Write to a hidden temp file next to path and os.replace() it into place on
+    # success, so readers never observe a truncated file (no per-file fsync)
+    tmp_path = _temp_sibling(path)
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class PagesWriter(threading.Thread):
+    # Background writer for pages.jsonl: extraction puts page records on a bounded
+    # queue and this thread serialises them to disk, so parsing overlaps with I/O
+    # and at most `maxsize` pages are buffered in memory
+
+    _COMMIT = object()
+    _ABORT = object()
+
+    def __init__(self, pages_path: Path, document_id: str, maxsize: int = 32):
+        super().__init__(name=f"pages-writer-{document_id}", daemon=True)
+        self.pages_path = pages_path
+        self.document_id = document_id
+        self.page_count = 0
+        # Pages recorded with an "error" (such extractions are not cached)
+        self.failed_pages = 0
+        self.error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, page_data: Dict[str, Any]):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(page_data)
+
+    def run(self):
+        finished = False
+        try:
+            with atomic_open(self.pages_path, "wb") as f:
+                while True:
+                    page_data = self._queue.get()
+                    if page_data is self._COMMIT or page_data is self._ABORT:
+                        finished = True
+                        if page_data is self._ABORT:
+                            raise InterruptedError("extraction aborted")
+                        break
+                    f.write(orjson.dumps({"documentId": self.document_id, **page_data}) + b"\n")
+                    self.page_count += 1
+                    if "error" in page_data:
+                        self.failed_pages += 1
+        except BaseException as e:
+            self.error = e
+            # Keep draining so a producer blocked on put() can reach close()
+            while not finished:
+                finished = self._queue.get() in (self._COMMIT, self._ABORT)
+
+    def close(self, commit: bool = True):
+        # Flush remaining pages and move pages.jsonl into place (or discard it)
+        self._queue.put(self._COMMIT if commit else self._ABORT)
+        self.join()
+        if commit and self.error is not None:
+            raise self.error
+
 
 class ExtractionService:
     def __init__(self, event_broker=None, storage_path: str = None):
@@ -24,7 +103,16 @@ class ExtractionService:
         storage_path = storage_path or os.getenv("STORAGE_PATH", "/app/storage/extracted")
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        # Content-addressed cache of previous extractions (keyed by PDF sha256)
+        self.cache_path = self.storage_path / ".cache"
         self.extraction_method = "pdfplumber"
+        # Skip layout analysis on pages that only paint images (scanned pages)
+        self.skip_image_only = os.getenv("SKIP_IMAGE_ONLY", "1") == "1"
+        # Pages opened per pdfplumber handle; bounds peak memory on very long PDFs
+        self.page_batch_size = max(1, int(os.getenv("PAGE_BATCH_SIZE", "50")))
+        # Opt-in per-page extract_text watchdog in seconds (0 disables it). A timeout fails the whole
+        # document: the abandoned page thread may still be using the shared pdfminer handle
+        self.page_timeout = float(os.getenv("PAGE_TIMEOUT_SECONDS", "0"))
         logger.info(f"✅ Extraction service initialized. Storage: {self.storage_path}")
 
     def extract_document(self, document_discovered_event: Dict[str, Any]) -> Dict[str, Any]:
@@ -36,10 +124,29 @@ class ExtractionService:
         correlation_id = document_discovered_event.get("correlationId")
         try:
             logger.info(f"🔄 Starting extraction for document: {document_id}")
-            # Extract PDF content
-            extracted_data = self._extract_pdf_content(url)
-            # Save extracted content to disk (event-sourced)
-            pages_ref = self._save_extracted_content(document_id=document_id, extracted_data=extracted_data)
+            # Reuse a previous extraction of the same PDF bytes if we have one
+            content_hash = self._content_hash(url)
+            extracted_data = self._load_cached_extraction(content_hash, document_id) if content_hash else None
+            if extracted_data is None:
+                # Extract PDF content, streaming pages to pages.jsonl as they are parsed
+                doc_dir = self.storage_path / document_id
+                doc_dir.mkdir(parents=True, exist_ok=True)
+                writer = PagesWriter(doc_dir / "pages.jsonl", document_id)
+                writer.start()
+                try:
+                    extracted_data = self._extract_pdf_content(url, on_page=writer.put)
+                except BaseException:
+                    writer.close(commit=False)
+                    raise
+                writer.close()
+                logger.info(f"📄 Saved {writer.page_count} pages to: {writer.pages_path}")
+                # Save extraction summary to disk (event-sourced)
+                pages_ref = self._save_extracted_content(document_id=document_id, extracted_data=extracted_data)
+                # Page errors may be transient (e.g. a timeout under load), so only clean extractions are reused
+                if content_hash and not writer.failed_pages:
+                    self._store_cached_extraction(content_hash, document_id)
+            else:
+                pages_ref = str((self.storage_path / document_id / "pages.jsonl").absolute())
             # Build DocumentExtracted event using common helper
             document_extracted_event = create_document_extracted_event(
                 document_id=document_id,
@@ -59,14 +166,14 @@ class ExtractionService:
             logger.error(f"❌ Failed to extract document {document_id}: {str(e)}")
             raise
 
-    def _extract_pdf_content(self, pdf_path: str) -> Dict[str, Any]:
+    def _extract_pdf_content(self, pdf_path: str, on_page: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
         # Extract text and metadata from a PDF file using pdfplumber.
-        # Returns a dictionary containing the content and metadata that was extracted
+        # Each page record is handed to on_page as soon as it is parsed, so only one page
+        # is held in memory; returns the extraction summary (page count, metadata, flags)
         extracted_data = {
             "text_extracted": False,
             "page_count": 0,
             "metadata": {},
-            "pages": [],
             "extraction_method": self.extraction_method,
         }
         try:
@@ -83,68 +190,197 @@ class ExtractionService:
 
                 extracted_data["metadata"]["year"] = self._extract_year(extracted_data["metadata"])
 
-                extracted_data["page_count"] = len(pdf.pages)
-
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text and page_text.strip():
-                            extracted_data["pages"].append({"page": page_num, "text": page_text.strip()})
-                        else:
-                            #! NOTE: Mark pages with no text (might be scanned/images)
-                            logger.warning(f"⚠️ No text found on page {page_num}")
-                            extracted_data["pages"].append(
-                                {"page": page_num, "text": "", "note": "No extractable text (might be scanned image)"}
-                            )
-                    except Exception as e:
-                        logger.warning(f"⚠️ Failed to extract text from page {page_num}: {e}")
-                        extracted_data["pages"].append({"page": page_num, "text": "", "error": str(e)})
-                extracted_data["text_extracted"] = any(p.get("text") for p in extracted_data["pages"])
+                page_count = len(pdf.pages)
+                extracted_data["page_count"] = page_count
+
+                text_extracted = False
+                # Small documents are extracted from the handle we already have open
+                if page_count <= self.page_batch_size:
+                    text_extracted = self._extract_pages(pdf.pages, 1, on_page)
+
+            # Large documents are re-opened one page range at a time so that only
+            # page_batch_size pages (and their pdfminer layout objects) are alive at once
+            if page_count > self.page_batch_size:
+                for first_page in range(1, page_count + 1, self.page_batch_size):
+                    last_page = min(first_page + self.page_batch_size - 1, page_count)
+                    with pdfplumber.open(pdf_path, pages=list(range(first_page, last_page + 1))) as pdf_slice:
+                        text_extracted |= self._extract_pages(pdf_slice.pages, first_page, on_page)
+            extracted_data["text_extracted"] = text_extracted
         except Exception as e:
             logger.error(f"❌ Error opening or reading PDF: {e}")
             raise
         return extracted_data
 
+    def _extract_pages(self, pages, first_page_num: int, emit: Callable[[Dict[str, Any]], None]) -> bool:
+        # Emit one record per page; returns True if any page had text
+        text_extracted = False
+        for page_num, page in enumerate(pages, start=first_page_num):
+            try:
+                if self.skip_image_only and self._is_image_only(page):
+                    logger.warning(f"⚠️ Page {page_num} only contains images, skipping text extraction")
+                    emit({"page": page_num, "text": "", "note": "Image-only page, text extraction skipped"})
+                    continue
+                page_text = self._extract_page_text(page)
+                if page_text and page_text.strip():
+                    emit({"page": page_num, "text": page_text.strip()})
+                    text_extracted = True
+                else:
+                    #! NOTE: Mark pages with no text (might be scanned/images)
+                    logger.warning(f"⚠️ No text found on page {page_num}")
+                    emit({"page": page_num, "text": "", "note": "No extractable text (might be scanned image)"})
+            except TimeoutError:
+                # The timed-out page is still being parsed on its own thread; don't touch the handle again
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to extract text from page {page_num}: {e}")
+                emit({"page": page_num, "text": "", "error": str(e)})
+        return text_extracted
+
+    def _extract_page_text(self, page) -> Optional[str]:
+        # pdfplumber is used without LAParams (laparams=None), so pdfminer's layout
+        # analysis never runs; the remaining worst case is a pathological content
+        # stream, which the optional watchdog below turns into a document failure
+        if self.page_timeout <= 0:
+            return page.extract_text()
+        result: Dict[str, Any] = {}
+
+        def run():
+            try:
+                result["text"] = page.extract_text()
+            except Exception as e:
+                result["error"] = e
+
+        # A stuck extract_text cannot be interrupted, so it runs in a daemon thread we can abandon
+        worker = threading.Thread(target=run, name="page-extract", daemon=True)
+        worker.start()
+        worker.join(self.page_timeout)
+        if worker.is_alive():
+            raise TimeoutError(f"extract_text exceeded {self.page_timeout:g}s")
+        if "error" in result:
+            raise result["error"]
+        return result.get("text")
+
+    def _is_image_only(self, page) -> bool:
+        # Cheap resource-dictionary check: a page without fonts whose XObjects are
+        # all images cannot yield text, so the content stream need not be parsed
+        try:
+            resources = resolve1(page.page_obj.resources) or {}
+            if resolve1(resources.get("Font")):
+                return False
+            xobjects = resolve1(resources.get("XObject")) or {}
+            return bool(xobjects) and all(resolve1(xobject).get("Subtype") is LITERAL_IMAGE for xobject in xobjects.values())
+        except Exception:
+            # Unusual resource layouts fall back to a normal extraction
+            return False
+
     def _extract_year(self, metadata: Dict[str, Any]) -> int:
         # !Extract year from metadata, fallback to current year
-        try:
-            creation_date = metadata.get("creation_date", "")
-            if isinstance(creation_date, str) and len(creation_date) >= 5:
-                #! NOTE: PDF dates are often like "D:20250122..."
-                year_str = creation_date[2:6] if creation_date.startswith("D:") else creation_date[:4]
+        creation_date = metadata.get("creation_date", "")
+        if isinstance(creation_date, str) and len(creation_date) >= 5:
+            #! NOTE: PDF dates are often like "D:20250122..."
+            year_str = creation_date[2:6] if creation_date.startswith("D:") else creation_date[:4]
+            # Structural check instead of catching ValueError from int()
+            if len(year_str) == 4 and year_str.isascii() and year_str.isdigit():
                 return int(year_str)
-        except (ValueError, IndexError):
-            pass
 
         return datetime.now(timezone.utc).year
 
+    def _content_hash(self, pdf_path: str) -> Optional[str]:
+        # sha256 of the PDF bytes, or None when the url is not a local file
+        if not pdf_path or not os.path.isfile(pdf_path):
+            return None
+        # file_digest reads into a reused buffer and hashes with the GIL released (OpenSSL, SHA-NI if present)
+        with open(pdf_path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    def _cache_dir(self, content_hash: str) -> Path:
+        return self.cache_path / content_hash[:2] / content_hash
+
+    def _load_cached_extraction(self, content_hash: str, document_id: str) -> Optional[Dict[str, Any]]:
+        # Populate the document directory from the cache and return the cached
+        # summary (page_count, text_extracted, metadata, ...), or None on a miss
+        cache_dir = self._cache_dir(content_hash)
+        cached_pages = cache_dir / "pages.jsonl"
+        cached_metadata = cache_dir / "metadata.json"
+        if not (cached_pages.exists() and cached_metadata.exists()):
+            return None
+        doc_dir = self.storage_path / document_id
+        doc_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            extracted_data = orjson.loads(cached_metadata.read_bytes())
+            if extracted_data.get("documentId") == document_id:
+                self._link_file(cached_pages, doc_dir / "pages.jsonl")
+                self._link_file(cached_metadata, doc_dir / "metadata.json")
+            else:
+                # Same bytes under another documentId: re-stamp the page records
+                with open(cached_pages, "rb") as src, atomic_open(doc_dir / "pages.jsonl", "wb") as dst:
+                    for line in src:
+                        dst.write(orjson.dumps({**orjson.loads(line), "documentId": document_id}) + b"\n")
+                extracted_data["documentId"] = document_id
+                with atomic_open(doc_dir / "metadata.json", "wb") as f:
+                    f.write(orjson.dumps(extracted_data, option=orjson.OPT_INDENT_2))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unusable extraction cache entry {content_hash}: {e}")
+            return None
+        logger.info(f"♻️ Reused cached extraction {content_hash[:12]} for document: {document_id}")
+        return extracted_data
+
+    def _store_cached_extraction(self, content_hash: str, document_id: str):
+        # Best effort: a failure here only costs a re-extraction next time
+        doc_dir = self.storage_path / document_id
+        cache_dir = self._cache_dir(content_hash)
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for name in ("pages.jsonl", "metadata.json"):
+                self._link_file(doc_dir / name, cache_dir / name)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not cache extraction for {document_id}: {e}")
+
+    @staticmethod
+    def _link_file(src: Path, dst: Path):
+        # Hardlink src to dst, atomically replacing whatever dst currently is.
+        # Falls back to a kernel-side copy (shutil.copyfile uses sendfile on Linux) when
+        # hardlinks are not possible, e.g. the cache and storage are on different mounts
+        if dst.exists() and os.path.samefile(src, dst):
+            return
+        tmp_path = _temp_sibling(dst)
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            try:
+                shutil.copyfile(src, tmp_path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+        os.replace(tmp_path, dst)
+
     def _save_extracted_content(self, document_id: str, extracted_data: Dict[str, Any]) -> str:
         # Document directory should already exist (created by Ingestion)
         doc_dir = self.storage_path / document_id
         doc_dir.mkdir(parents=True, exist_ok=True)
-        # Read discovered.json to get original discovery metadata (optional, for logging)
+        # discovered.json (written by Ingestion) is only reported on, so don't parse it
         discovered_path = doc_dir / "discovered.json"
-        try:
-            with open(discovered_path, "r", encoding="utf-8") as f:
-                discovered_event = json.load(f)
-            logger.info(f"📖 Read DocumentDiscovered event from: {discovered_path}")
-        except FileNotFoundError:
+        if discovered_path.exists():
+            logger.info(f"📖 Found DocumentDiscovered event at: {discovered_path}")
+        else:
             logger.warning(f"⚠️ discovered.json not found for {document_id}")
         pages_path = doc_dir / "pages.jsonl"
-        # Save pages.jsonl (one JSON object per line)
-        with open(pages_path, "w", encoding="utf-8") as f:
-            for page_data in extracted_data["pages"]:
-                page_record = {"documentId": document_id, **page_data}
-                f.write(json.dumps(page_record, ensure_ascii=False) + "\n")
-        logger.info(f"📄 Saved {len(extracted_data['pages'])} pages to: {pages_path}")
+        metadata_path = doc_dir / "metadata.json"
+        # pages.jsonl is streamed by PagesWriter during extraction; save the
+        # extraction summary alongside it for cache reuse
+        summary = {"documentId": document_id, **extracted_data}
+        # Serialize in one go and hand the file a single buffer
+        with atomic_open(metadata_path, "wb") as f:
+            f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
         return str(pages_path.absolute())
 
     def _save_event(self, document_id: str, event: Dict[str, Any], filename: str):
         doc_dir = self.storage_path / document_id
         doc_dir.mkdir(parents=True, exist_ok=True)
         event_file = doc_dir / filename
-        with open(event_file, "w", encoding="utf-8") as f:
-            json.dump(event, f, indent=2, ensure_ascii=False)
+        with atomic_open(event_file, "wb") as f:
+            f.write(orjson.dumps(event, option=orjson.OPT_INDENT_2))
         logger.info(f"💾 Saved event to: {event_file}")
 
     def publish_event(self, event: Dict[str, Any]) -> bool:
@@ -152,7 +388,7 @@ class ExtractionService:
             logger.warning("⚠️ Event broker not configured. Event not published.")
             return False
         try:
-            self.event_broker.publish(routing_key=ROUTING_KEY_EXTRACTED, message=json.dumps(event), exchange="events")
+            self.event_broker.publish(routing_key=ROUTING_KEY_EXTRACTED, message=orjson.dumps(event), exchange="events")
             logger.info(f"✅ Published DocumentExtracted event: {event['eventId']}")
             return True
         except Exception as e:
@@ -177,7 +413,9 @@ class ExtractionService:
                 document_id=document_id, correlation_id=correlation_id, error_message=error_message, error_type=error_type
             )
             # Publish to RabbitMQ
-            self.event_broker.publish(routing_key=ROUTING_KEY_EXTRACTION_FAILED, message=json.dumps(event), exchange="events")
+            self.event_broker.publish(
+                routing_key=ROUTING_KEY_EXTRACTION_FAILED, message=orjson.dumps(event), exchange="events"
+            )
             logger.info(f"✅ ExtractionFailed event published for document {document_id}")
             return True
         except Exception as e:
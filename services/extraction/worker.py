@@ -9,6 +9,7 @@ Architecture:
     - Connects to RabbitMQ message broker for event-driven communication
     - Runs HTTP health check server in background thread for monitoring
     - Stateless: Can be scaled horizontally for parallel processing
+    - Extracts up to WORKER_THREADS documents concurrently, with PREFETCH messages in flight
 
 Health Check:
     - HTTP server on port 8080 (/health endpoint)
@@ -17,70 +18,157 @@ Health Check:
     - Used by Docker health checks
 """
 
-import json
+import os
 import sys
-from pathlib import Path
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 
-current_dir = Path(__file__).resolve().parent
-project_root = current_dir
-sys.path.insert(0, str(project_root))
+import orjson
 
-from extraction_service import ExtractionService
-
-from common.config import get_rabbitmq_broker, get_storage_path
+from common.config import DISCOVERED_SHARD_COUNT, get_rabbitmq_broker, get_storage_path
 from common.events import ROUTING_KEY_DISCOVERED, ROUTING_KEY_EXTRACTED, ROUTING_KEY_EXTRACTION_FAILED
 from common.health import start_health_server
 from common.logging_config import setup_logging
-
-logger = setup_logging(__name__)
+from common.mq import AckBatcher
+
+logger = setup_logging(__name__, background=True)
+
+# Up to PREFETCH documents are delivered at once and extracted on a pool of WORKER_THREADS
+PREFETCH = max(1, int(os.getenv("PREFETCH", "16")))
+WORKER_THREADS = max(1, int(os.getenv("WORKER_THREADS", str(min(PREFETCH, os.cpu_count() or 1)))))
+# Acks are coalesced into one basic_ack(multiple=True) per batch; keep batches below PREFETCH
+# so the broker can keep delivering while a batch fills up
+ACK_BATCH_SIZE = max(1, int(os.getenv("ACK_BATCH_SIZE", str(max(1, PREFETCH // 2)))))
+ACK_FLUSH_INTERVAL = float(os.getenv("ACK_FLUSH_INTERVAL_SECONDS", "0.1"))
+# DocumentDiscovered events are small; anything outside these bounds is rejected before parsing
+MIN_MESSAGE_BYTES = 50
+MAX_MESSAGE_BYTES = int(os.getenv("MAX_MESSAGE_BYTES", "1000000"))
+# With DISCOVERED_SHARD_COUNT > 1 each replica consumes the shard given by SHARD_ID
+SHARD_ID = int(os.getenv("SHARD_ID", "0"))
+DISCOVERED_QUEUE = (
+    ROUTING_KEY_DISCOVERED if DISCOVERED_SHARD_COUNT == 1 else f"{ROUTING_KEY_DISCOVERED}.{SHARD_ID % DISCOVERED_SHARD_COUNT}"
+)
+
+# Optional CPU pinning (Linux, needs 2+ CPUs): the consumer thread gets the first allowed CPU and the
+# extraction threads the rest, so frame handling and PDF parsing don't evict each other's caches
+ALLOWED_CPUS = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+CPU_PINNING = os.getenv("CPU_PINNING", "0") == "1" and len(ALLOWED_CPUS) > 1
+
+
+def pin_extraction_thread():
+    # ThreadPoolExecutor initializer; pid 0 means the calling thread on Linux
+    os.sched_setaffinity(0, ALLOWED_CPUS[1:])
+
+
+executor = ThreadPoolExecutor(
+    max_workers=WORKER_THREADS,
+    thread_name_prefix="extraction",
+    initializer=pin_extraction_thread if CPU_PINNING else None,
+)
+# Futures whose delivery has not been settled yet (only touched on the connection thread)
+in_flight = set()
 
 
 def process_document_discovered(ch, method, properties, body):
     """
+    - Runs on the pika connection thread: validates the message and hands extraction to the pool
     - Failed extractions publish ExtractionFailed events for monitoring
     - Messages are always acknowledged (removed from queue) to prevent infinite loops
     - Processing continues with next document even if current one fails
     """
+    # Bind per-message lookups once; the tag is also captured by the completion callback
+    delivery_tag = method.delivery_tag
+    batcher = ack_batcher
+    batcher.track(delivery_tag)
     try:
-        # Decode the message body
-        event = json.loads(body)
-
-        # Validate event structure
-        if "payload" not in event or "documentId" not in event.get("payload", {}):
-            logger.error(f"❌ Invalid event structure: {event}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        # Cheap byte-level check: reject messages that cannot carry a documentId without parsing them
+        if not MIN_MESSAGE_BYTES <= len(body) <= MAX_MESSAGE_BYTES or b'"documentId"' not in body:
+            logger.error("❌ Invalid event structure (%d bytes, no documentId): %r", len(body), body[:200])
+            batcher.nack(delivery_tag, requeue=False)
             return
 
-        logger.info(f"📥 Received DocumentDiscovered: {event['payload']['documentId']}")
+        # Decode the message body (orjson parses bytes directly)
+        event = orjson.loads(body)
+
+        # Validate event structure in one lookup chain (also rejects non-object JSON)
+        payload = event.get("payload") if isinstance(event, dict) else None
+        document_id = payload.get("documentId") if isinstance(payload, dict) else None
+        if not isinstance(document_id, str):
+            logger.error("❌ Invalid event structure: %s", event)
+            batcher.nack(delivery_tag, requeue=False)
+            return
 
-        # Process the event
-        result = extraction_service.handle_document_discovered_event(event)
+        # One INFO line per document is logged on completion; receipt is only traced at DEBUG
+        logger.debug("📥 Received DocumentDiscovered: %s", document_id)
 
-        if result:
-            logger.info(f"✅ Processed: {result['payload']['documentId']}")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-        else:
-            # Extraction failed, but failure event was already published
-            # Acknowledge message to remove from queue and continue processing
-            logger.warning(f"⚠️ Processing failed for {event['payload']['documentId']}, but continuing...")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        # Process the event on the pool; the ack is scheduled back onto this thread when it finishes
+        try:
+            future = executor.submit(extract_document, event)
+        except RuntimeError:
+            # Pool already shut down: hand the message back so it is extracted after restart
+            logger.warning("⚠️ Shutting down, requeueing %s", document_id)
+            batcher.nack(delivery_tag, requeue=True)
+            return
+        in_flight.add(future)
+        add_callback_threadsafe = ch.connection.add_callback_threadsafe
+        future.add_done_callback(lambda done: add_callback_threadsafe(partial(settle_delivery, done, delivery_tag)))
 
-    except json.JSONDecodeError as e:
-        logger.error(f"❌ JSON parsing error: {e}")
-        logger.error(f"Body content: {body}")
+    except orjson.JSONDecodeError as e:
+        logger.error("❌ JSON parsing error: %s", e)
+        logger.error("Body content: %r", body)
         # Don't requeue malformed messages - acknowledge to remove from queue
         logger.warning("⚠️ Malformed message, acknowledging to skip...")
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        batcher.ack(delivery_tag)
 
     except KeyboardInterrupt:
         # Allow graceful shutdown
         raise
 
     except Exception as e:
-        logger.error(f"❌ Unexpected error in worker: {str(e)}", exc_info=True)
+        logger.error("❌ Unexpected error in worker: %s", e, exc_info=True)
+        # For unexpected worker errors, acknowledge to prevent infinite loop
+        logger.warning("⚠️ Unexpected error, acknowledging to continue processing...")
+        batcher.ack(delivery_tag)
+
+
+def extract_document(event):
+    # Runs on a pool thread
+    result = extraction_service.handle_document_discovered_event(event)
+
+    if result:
+        logger.info("✅ Processed: %s", result["payload"]["documentId"])
+    else:
+        # Extraction failed, but failure event was already published
+        # Acknowledge message to remove from queue and continue processing
+        logger.warning("⚠️ Processing failed for %s, but continuing...", event["payload"]["documentId"])
+
+
+def settle_delivery(future: Future, delivery_tag: int):
+    # Runs on the pika connection thread once extract_document has finished
+    in_flight.discard(future)
+    if future.cancelled():
+        # Shutting down: leave unacked so the broker redelivers it
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error("❌ Unexpected error in worker: %s", error, exc_info=error)
         # For unexpected worker errors, acknowledge to prevent infinite loop
         logger.warning("⚠️ Unexpected error, acknowledging to continue processing...")
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+    ack_batcher.ack(delivery_tag)
+
+
+def drain_in_flight(broker, timeout: float = 60.0):
+    # Stop taking new work and let running extractions finish. Cancelling the consumer first makes pika
+    # reject (requeue) deliveries that were prefetched but not dispatched yet, so none reach the closed pool.
+    # The connection thread keeps servicing the running extractions' publishes and acks while we wait
+    if broker.channel and broker.channel.is_open:
+        broker.channel.stop_consuming()
+    executor.shutdown(wait=False, cancel_futures=True)
+    deadline = time.monotonic() + timeout
+    while in_flight and broker.connection.is_open and time.monotonic() < deadline:
+        broker.connection.process_data_events(time_limit=0.1)
+    ack_batcher.flush()
 
 
 if __name__ == "__main__":
@@ -97,13 +185,17 @@ if __name__ == "__main__":
 
     # Declare queues and exchange
     try:
-        broker.declare_queue(ROUTING_KEY_DISCOVERED)
+        if DISCOVERED_SHARD_COUNT == 1:
+            broker.declare_queue(ROUTING_KEY_DISCOVERED)
         broker.declare_queue(ROUTING_KEY_EXTRACTED)
         broker.declare_queue(ROUTING_KEY_EXTRACTION_FAILED)
 
         if broker.channel:
             broker.channel.exchange_declare(exchange="events", exchange_type="topic", durable=True)
-            broker.channel.queue_bind(exchange="events", queue=ROUTING_KEY_DISCOVERED, routing_key=ROUTING_KEY_DISCOVERED)
+            if DISCOVERED_SHARD_COUNT > 1:
+                broker.declare_sharded_queues(ROUTING_KEY_DISCOVERED, DISCOVERED_SHARD_COUNT)
+            else:
+                broker.channel.queue_bind(exchange="events", queue=ROUTING_KEY_DISCOVERED, routing_key=ROUTING_KEY_DISCOVERED)
             broker.channel.queue_bind(exchange="events", queue=ROUTING_KEY_EXTRACTED, routing_key=ROUTING_KEY_EXTRACTED)
             broker.channel.queue_bind(
                 exchange="events", queue=ROUTING_KEY_EXTRACTION_FAILED, routing_key=ROUTING_KEY_EXTRACTION_FAILED
@@ -113,21 +205,37 @@ if __name__ == "__main__":
         logger.error(f"❌ Failed to configure queues: {e}")
         sys.exit(1)
 
+    # Start health check server before loading the PDF stack so probes answer during startup
+    start_health_server(broker, service_name="extraction-service", port=8080)
+
+    # Imported here so pdfplumber/pdfminer only load once RabbitMQ is reachable, not on module import
+    from extraction_service import ExtractionService
+
     # Initialize extraction service with storage path
     storage_path = get_storage_path()
     extraction_service = ExtractionService(event_broker=broker, storage_path=str(storage_path))
     logger.info(f"✅ Extraction service initialized. Storage: {storage_path}")
 
-    # Start health check server
-    start_health_server(broker, service_name="extraction-service", port=8080)
+    if CPU_PINNING:
+        # After the health thread has started, so only the consumer (and its pool threads) inherit this
+        os.sched_setaffinity(0, ALLOWED_CPUS[:1])
+        logger.info(f"📌 Consumer pinned to CPU {ALLOWED_CPUS[0]}, extraction to CPUs {ALLOWED_CPUS[1:]}")
+
+    ack_batcher = AckBatcher(broker.channel, max_pending=ACK_BATCH_SIZE, flush_interval=ACK_FLUSH_INTERVAL)
 
-    logger.info("👂 Listening for DocumentDiscovered events...")
+    logger.info(f"👂 Listening for DocumentDiscovered events on {DISCOVERED_QUEUE}...")
     logger.info("Press Ctrl+C to stop")
 
     try:
-        broker.consume(queue_name=ROUTING_KEY_DISCOVERED, callback=process_document_discovered, auto_ack=False)
+        broker.consume(
+            queue_name=DISCOVERED_QUEUE,
+            callback=process_document_discovered,
+            auto_ack=False,
+            prefetch_count=PREFETCH,
+        )
     except KeyboardInterrupt:
         logger.info("\n⏹️ Shutting down gracefully...")
+        drain_in_flight(broker)
         broker.close()
         logger.info("👋 Goodbye!")
     except Exception as e:
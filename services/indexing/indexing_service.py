@@ -8,15 +8,29 @@ Process:
 4. Store vectors in Qdrant with metadata for citations
 """
 
-import json
 import logging
 import os
+import platform
+import queue
+import threading
 import time
-from typing import Any, Dict, List
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import numpy as np
+import orjson
+import torch
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from qdrant_client.models import (
+    Batch,
+    Distance,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
 from sentence_transformers import SentenceTransformer
 
 from common.events import (
@@ -30,6 +44,26 @@ from common.mq import RabbitMQEventBroker
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# How long the publisher thread waits for an event before servicing the idle connection
+PUBLISHER_IDLE_SECONDS = 30
+
+
+def quantized_onnx_file() -> str:
+    """Pick the int8 ONNX export of all-MiniLM-L6-v2 built for this CPU's instruction set"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "model_qint8_arm64.onnx"
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = next((line.split(":", 1)[1].split() for line in f if line.startswith("flags")), [])
+    except OSError:
+        flags = []
+    # VNNI does int8 dot products in one instruction; plain AVX-512 and AVX2 builds fall back to wider emulation
+    if "avx512_vnni" in flags:
+        return "model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags:
+        return "model_qint8_avx512.onnx"
+    return "model_quint8_avx2.onnx"
+
 
 class IndexingService:
     """Handles document chunking, embedding generation, and vector storage in Qdrant"""
@@ -38,6 +72,16 @@ class IndexingService:
         """Initialize event broker, load embedding model, and connect to Qdrant"""
         logger.info("Initializing Indexing Service...")
 
+        # Use every CPU this process may run on for the torch backend's matmuls (containers often start torch
+        # with a different intra-op thread count). The affinity mask respects cpusets; os.cpu_count() is the host's
+        usable_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS") or usable_cpus))
+        try:
+            torch.set_num_interop_threads(2)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+
         # RabbitMQ configuration
         self.rabbitmq_host = os.getenv("RABBITMQ_HOST", "localhost")
         self.rabbitmq_port = int(os.getenv("RABBITMQ_PORT", "5672"))
@@ -49,26 +93,103 @@ class IndexingService:
         self.event_broker = RabbitMQEventBroker(
             host=self.rabbitmq_host, port=self.rabbitmq_port, username=self.rabbitmq_user, password=self.rabbitmq_password
         )
+        # Events are handed to a sender thread that owns the connection from here on, so a publish never
+        # blocks the handler; while idle it keeps servicing the connection so heartbeats are answered.
+        # Each event is first written to the outbox directory, which the handler returns (and the worker
+        # acks) only after; the sender deletes the file once published, and leftovers are resent at startup
+        self.outbox_path = os.path.join(self.storage_path, ".outbox")
+        self._publish_queue: "queue.Queue[Optional[Tuple[str, bytes, str]]]" = queue.Queue()
+        self._replay_outbox()
+        self._publisher = threading.Thread(target=self._run_publisher, name="indexing-publisher", daemon=True)
+        self._publisher.start()
+
+        # Connect to Qdrant on a background thread so its retries overlap with the (slow) model load
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="qdrant-connect") as connect_pool:
+            qdrant_ready = connect_pool.submit(self._connect_qdrant)
+
+            # Load embedding model (all-MiniLM-L6-v2 creates 384-dimensional vectors)
+            # EMBEDDING_DEVICE unset lets sentence-transformers pick CUDA when it is available.
+            # Without CUDA the model runs through ONNX Runtime instead of eager PyTorch, using the fp32 export so
+            # index vectors match the fp32 query encoder in the retrieval service. EMBEDDING_ONNX_QUANTIZED=1 opts
+            # into the CPU-matched int8 export (faster, but queries are then encoded by a different model);
+            # EMBEDDING_BACKEND overrides the choice and EMBEDDING_ONNX_FILE pins one of the exported variants
+            backend = os.getenv("EMBEDDING_BACKEND") or ("torch" if torch.cuda.is_available() else "onnx")
+            model_kwargs = {}
+            if backend == "onnx":
+                onnx_file = os.getenv("EMBEDDING_ONNX_FILE")
+                if not onnx_file and os.getenv("EMBEDDING_ONNX_QUANTIZED", "0") == "1":
+                    onnx_file = quantized_onnx_file()
+                if onnx_file:
+                    model_kwargs["file_name"] = onnx_file
+            logger.info(f"Loading embedding model: all-MiniLM-L6-v2 ({backend} backend)")
+            self.model = SentenceTransformer(
+                "all-MiniLM-L6-v2", device=os.getenv("EMBEDDING_DEVICE") or None, backend=backend, model_kwargs=model_kwargs
+            )
+            if backend == "torch" and self.model.device.type == "cuda" and os.getenv("EMBEDDING_FP16", "1") == "1":
+                # Half-precision weights roughly double GPU encode throughput
+                self.model.half()
+            logger.info(f"Embedding model loaded successfully on {self.model.device}")
+
+            # Chunks are ~200 tokens and encode() groups them by length, so larger batches pad very little;
+            # MiniLM is small enough that GPU memory is not the limit at twice the CPU batch
+            on_cuda = self.model.device.type == "cuda"
+            self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE") or (128 if on_cuda else 64))
 
-        # Load embedding model (all-MiniLM-L6-v2 creates 384-dimensional vectors)
-        logger.info("Loading embedding model: all-MiniLM-L6-v2")
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        logger.info("Embedding model loaded successfully")
+            # With several GPUs, encode data-parallel with one worker process per CUDA device
+            self.encode_pool = None
+            if backend == "torch" and torch.cuda.device_count() > 1:
+                self.encode_pool = self.model.start_multi_process_pool()
+                logger.info(f"Started multi-GPU encode pool on {torch.cuda.device_count()} devices")
 
-        # Connect to Qdrant with retry logic
+            existing_collections = qdrant_ready.result()
+
+        self.collection_name = "marp-documents"
+        self.vector_size = 384
+        # Points are upserted in batches; the default matches the pipeline batch below, so each
+        # pipeline step is a single upsert request
+        self.upsert_batch_size = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+        # Pages tokenized per batched tokenizer call
+        self.chunk_page_batch_size = int(os.getenv("CHUNK_PAGE_BATCH_SIZE", "32"))
+        # Chunks per encode/upload pipeline step; one upload runs in the background at a time
+        self.pipeline_batch_size = int(os.getenv("INDEXING_PIPELINE_BATCH_SIZE", "256"))
+        self.upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qdrant-upload")
+        # Debug/audit files are written in the background so they never delay the ack
+        self.io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="indexing-io")
+        # chunks.jsonl is a debugging aid only; keeping every chunk of a document around for it is opt-in
+        self.save_chunks = os.getenv("DEBUG_SAVE_CHUNKS", "0") == "1"
+        self._setup_qdrant_collection(existing_collections)
+
+        logger.info("Indexing Service initialized successfully")
+
+    def _connect_qdrant(self) -> Set[str]:
+        """Connect to Qdrant with retry logic and return the names of the existing collections"""
         qdrant_host = os.getenv("QDRANT_HOST", "qdrant")
         qdrant_port = int(os.getenv("QDRANT_PORT", "6333"))
-        logger.info(f"Connecting to Qdrant at {qdrant_host}:{qdrant_port}")
-        max_retries = 10
-        retry_delay = 2
+        # gRPC ships vectors as packed protobuf floats instead of JSON number arrays
+        qdrant_grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+        prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "1") == "1"
+        logger.info(f"Connecting to Qdrant at {qdrant_host}:{qdrant_grpc_port if prefer_grpc else qdrant_port}")
+        # The client connects lazily, so it is built once and only the probe is retried. Keepalive pings hold
+        # the single HTTP/2 channel open between documents instead of letting idle proxies drop it
+        self.qdrant = QdrantClient(
+            host=qdrant_host,
+            port=qdrant_port,
+            grpc_port=qdrant_grpc_port,
+            prefer_grpc=prefer_grpc,
+            grpc_options={"grpc.keepalive_time_ms": 30000, "grpc.keepalive_timeout_ms": 10000},
+        )
+        max_retries = 20
         for attempt in range(max_retries):
             try:
-                self.qdrant = QdrantClient(host=qdrant_host, port=qdrant_port)
-                self.qdrant.get_collections()
+                # The readiness probe doubles as the collection lookup, so setup needs no extra round-trip
+                collections = self.qdrant.get_collections().collections
                 logger.info("Successfully connected to Qdrant")
-                break
+                return {collection.name for collection in collections}
             except Exception as e:
                 if attempt < max_retries - 1:
+                    # Exponential backoff from 50ms: a Qdrant that is nearly up is picked up almost at once,
+                    # while the 2s cap keeps polling a slow start closely for ~30s in total
+                    retry_delay = min(0.05 * 2**attempt, 2)
                     logger.warning(f"Qdrant not ready (attempt {attempt + 1}/{max_retries}): {e}")
                     logger.info(f"Retrying in {retry_delay} seconds...")
                     time.sleep(retry_delay)
@@ -76,19 +197,25 @@ class IndexingService:
                     logger.error(f"Failed to connect to Qdrant after {max_retries} attempts")
                     raise
 
-        self.collection_name = "marp-documents"
-        self.vector_size = 384
-        self._setup_qdrant_collection()
-
-        logger.info("Indexing Service initialized successfully")
+    def _setup_qdrant_collection(self, existing_collections: Set[str]):
+        """Create Qdrant collection with 384-dimensional INT8-quantized vectors and cosine similarity"""
+        # INT8 scalar quantization keeps a 4x smaller copy of every vector in RAM for search, while
+        # the float32 originals (used for rescoring) and payloads stay on disk
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+        if self.collection_name in existing_collections:
+            logger.info(f"Collection '{self.collection_name}' already exists")
+            self._ensure_quantization(quantization_config)
+            return
 
-    def _setup_qdrant_collection(self):
-        """Create Qdrant collection with 384-dimensional vectors and cosine similarity"""
         try:
             logger.info(f"Creating collection '{self.collection_name}'")
             self.qdrant.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
+                vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE, on_disk=True),
+                quantization_config=quantization_config,
+                on_disk_payload=True,
             )
             logger.info(f"Collection '{self.collection_name}' created successfully")
         except Exception as e:
@@ -97,6 +224,16 @@ class IndexingService:
             else:
                 logger.warning(f"Qdrant collection setup warning: {str(e)}")
 
+    def _ensure_quantization(self, quantization_config: ScalarQuantization):
+        """Turn on INT8 quantization for a collection created before it was the default"""
+        try:
+            if self.qdrant.get_collection(self.collection_name).config.quantization_config is None:
+                # Qdrant builds the quantized vectors for the existing points in the background
+                self.qdrant.update_collection(collection_name=self.collection_name, quantization_config=quantization_config)
+                logger.info(f"Enabled INT8 scalar quantization on '{self.collection_name}'")
+        except Exception as e:
+            logger.warning(f"Could not enable quantization on '{self.collection_name}': {str(e)}")
+
     def handle_document_extracted_event(self, event: Dict[str, Any]):
         """
         Process DocumentExtracted event: read pages, chunk, embed, store in Qdrant, and publish success event
@@ -107,7 +244,7 @@ class IndexingService:
             correlation_id = event["correlationId"]
             logger.info(f"Processing DocumentExtracted event for document {document_id}")
 
-            # Read extracted pages from disk
+            # Stream extracted pages from disk
             pages = self._read_pages(document_id)
 
             # Get metadata from event
@@ -115,36 +252,35 @@ class IndexingService:
             doc_title = doc_metadata.get("title", "Unknown")
             doc_url = event["payload"].get("url", "")
 
-            # Chunk each page
-            all_chunks = []
-            for page in pages:
-                page_num = page.get("page", 0)
-                page_text = page.get("text", "")
-
-                chunk_metadata = {
-                    "title": doc_title,
-                    "page": page_num,
-                    "url": doc_url,
-                    "document_id": document_id,
-                }
-
-                page_chunks = self.chunk_document(page_text, chunk_metadata)
-                all_chunks.extend(page_chunks)
-
-            logger.info(f"Total chunks created: {len(all_chunks)}")
-
-            # Generate embeddings for all chunks
-            chunk_texts = [chunk["text"] for chunk in all_chunks]
-            embeddings = self.generate_embeddings(chunk_texts)
-
-            # Store in Qdrant
-            self.store_chunks_in_qdrant(all_chunks, embeddings, document_id)
-
-            # Save chunks to disk for debugging
-            self._save_chunks(document_id, all_chunks)
+            # Stream the document through chunk -> embed -> store: chunks are embedded as soon as a
+            # pipeline batch fills up, and while one batch uploads to Qdrant on the upload thread the next
+            # one is already chunking/encoding. Only one batch of embeddings exists at any time
+            all_chunks: List[Dict[str, Any]] = []
+            batch: List[Dict[str, Any]] = []
+            chunk_count = 0
+            pending_upload = None
+            for page_chunks in self._iter_page_chunks(pages, doc_title, doc_url, document_id):
+                if self.save_chunks:
+                    all_chunks.extend(page_chunks)
+                batch.extend(page_chunks)
+                while len(batch) >= self.pipeline_batch_size:
+                    full_batch, batch = batch[: self.pipeline_batch_size], batch[self.pipeline_batch_size :]
+                    pending_upload = self._embed_and_store(full_batch, document_id, chunk_count, pending_upload)
+                    chunk_count += len(full_batch)
+            if batch:
+                pending_upload = self._embed_and_store(batch, document_id, chunk_count, pending_upload)
+                chunk_count += len(batch)
+            if pending_upload:
+                pending_upload.result()
+
+            logger.info(f"Total chunks indexed: {chunk_count}")
+
+            # Save chunks to disk for debugging (DEBUG_SAVE_CHUNKS=1)
+            if self.save_chunks:
+                self._save_in_background(self._save_chunks, document_id, all_chunks)
 
             # Publish success event
-            self.publish_chunks_indexed_event(document_id, correlation_id, len(all_chunks))
+            self.publish_chunks_indexed_event(document_id, correlation_id, chunk_count)
 
             logger.info(f"Successfully indexed document {document_id}")
 
@@ -152,6 +288,38 @@ class IndexingService:
             logger.error(f"Error processing DocumentExtracted event: {str(e)}", exc_info=True)
             self._publish_indexing_failed_event(event, str(e))
 
+    def _iter_page_chunks(
+        self, pages: Iterator[Dict[str, Any]], doc_title: str, doc_url: str, document_id: str
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the chunks of each group of pages; each group is tokenized in one batch call"""
+        # The fast (Rust) tokenizer spreads a batch call across all cores
+        page_texts: List[str] = []
+        page_metadata: List[Dict[str, Any]] = []
+        for page in pages:
+            page_texts.append(page.get("text", ""))
+            page_metadata.append(
+                {
+                    "title": doc_title,
+                    "page": page.get("page", 0),
+                    "url": doc_url,
+                    "document_id": document_id,
+                }
+            )
+            if len(page_texts) == self.chunk_page_batch_size:
+                yield self.chunk_pages(page_texts, page_metadata)
+                page_texts, page_metadata = [], []
+        if page_texts:
+            yield self.chunk_pages(page_texts, page_metadata)
+
+    def _embed_and_store(
+        self, batch: List[Dict[str, Any]], document_id: str, start_index: int, previous_upload: Optional[Future]
+    ) -> Future:
+        """Embed one pipeline batch, wait for the previous upload, then start uploading this batch"""
+        embeddings = self.generate_embeddings([chunk["text"] for chunk in batch])
+        if previous_upload:
+            previous_upload.result()
+        return self.upload_executor.submit(self.store_chunks_in_qdrant, batch, embeddings, document_id, start_index)
+
     def chunk_document(
         self, text: str, metadata: dict, max_tokens: int = 200, overlap_tokens: int = 50
     ) -> List[Dict[str, Any]]:
@@ -160,80 +328,131 @@ class IndexingService:
         - max_tokens: 200 (stays under model's 256 limit)
         - overlap_tokens: 50 (25% overlap to preserve context)
         """
-        tokenizer = self.model.tokenizer
-        tokens = tokenizer.encode(text, add_special_tokens=False)
+        return self.chunk_pages([text], [metadata], max_tokens, overlap_tokens)
 
+    def chunk_pages(
+        self, texts: List[str], metadata: List[Dict[str, Any]], max_tokens: int = 200, overlap_tokens: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Chunk several pages like chunk_document, tokenizing them all in one batched tokenizer call"""
+        # Only character offsets are needed: each chunk is sliced straight out of the page text
+        # between its first and last token, so no token ids are ever decoded back to strings
+        # Identical pages (blank pages, repeated forms and cover sheets) are tokenized only once
+        unique_texts = list(dict.fromkeys(texts))
+        offset_lists = self.model.tokenizer(
+            unique_texts, add_special_tokens=False, return_attention_mask=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        offsets_by_text = dict(zip(unique_texts, offset_lists))
+
+        step = max_tokens - overlap_tokens
         chunks = []
-        start_idx = 0
-
-        while start_idx < len(tokens):
-            end_idx = min(start_idx + max_tokens, len(tokens))
-            chunk_tokens = tokens[start_idx:end_idx]
-            chunk_text = tokenizer.decode(chunk_tokens, skip_special_tokens=True).strip()
-
-            if chunk_text:
-                chunks.append({"text": chunk_text, "metadata": metadata.copy()})
-
-            start_idx += max_tokens - overlap_tokens
-
-        logger.info(f"Chunked document into {len(chunks)} overlapping chunks")
+        for text, page_metadata in zip(texts, metadata):
+            offsets = offsets_by_text[text]
+            # Every chunk of a page shares one read-only view of its metadata instead of a copy each
+            shared_metadata = MappingProxyType(page_metadata)
+            for start_idx in range(0, len(offsets), step):
+                window = offsets[start_idx : start_idx + max_tokens]
+                chunk_text = text[window[0][0] : window[-1][1]].strip()
+                if chunk_text:
+                    chunks.append({"text": chunk_text, "metadata": shared_metadata})
+
+        logger.info(f"Chunked {len(texts)} pages into {len(chunks)} overlapping chunks")
         return chunks
 
-    def _read_pages(self, document_id: str) -> List[Dict[str, Any]]:
-        """Read extracted pages from storage/extracted/{documentId}/pages.jsonl (JSONL format)"""
+    def _read_pages(self, document_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream extracted pages from storage/extracted/{documentId}/pages.jsonl (JSONL format)"""
         pages_file = os.path.join(self.storage_path, document_id, "pages.jsonl")
         logger.info(f"Reading pages from {pages_file}")
 
-        pages = []
-        with open(pages_file, "r", encoding="utf-8") as f:
+        # Pages are yielded one at a time so each can be freed as soon as it is chunked;
+        # orjson parses the raw bytes directly and tolerates the trailing newline
+        with open(pages_file, "rb") as f:
             for line in f:
-                page_data = json.loads(line.strip())
-                pages.append(page_data)
-
-        logger.info(f"Read {len(pages)} pages from {pages_file}")
-        return pages
+                yield orjson.loads(line)
 
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate 384-dimensional embeddings for text chunks using all-MiniLM-L6-v2"""
-        logger.info(f"Generating embeddings for {len(texts)} chunks")
-        embeddings = self.model.encode(texts, batch_size=32, show_progress_bar=False)
+        # Repeated headers/footers chunk to identical text, so each distinct text is encoded once
+        # and its row is fanned back out to every position it appeared at
+        unique_texts: Dict[str, int] = {}
+        inverse = [unique_texts.setdefault(text, len(unique_texts)) for text in texts]
+        logger.info(f"Generating embeddings for {len(texts)} chunks ({len(unique_texts)} unique)")
+        # encode() already length-sorts texts into batches and restores the input order;
+        # normalized output makes Qdrant's cosine distance a plain dot product.
+        # On CUDA the batches are stacked on the device and copied to host once, instead of one sync per batch
+        on_cuda = self.model.device.type == "cuda"
+        if self.encode_pool:
+            # encode_multi_process hands each GPU a contiguous slice and only length-sorts within it,
+            # so sort globally first to give every device uniformly sized (lightly padded) batches
+            texts_by_length = sorted(unique_texts, key=len)
+            encoded = self.model.encode_multi_process(
+                texts_by_length, self.encode_pool, batch_size=self.embedding_batch_size, normalize_embeddings=True
+            )
+            embeddings = np.empty_like(encoded)
+            embeddings[[unique_texts[text] for text in texts_by_length]] = encoded
+        else:
+            embeddings = self.model.encode(
+                list(unique_texts),
+                batch_size=self.embedding_batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=not on_cuda,
+                convert_to_tensor=on_cuda,
+                normalize_embeddings=True,
+            )
+            if on_cuda:
+                embeddings = embeddings.cpu().numpy()
+        # The FP16 model returns float16 rows; Qdrant stores float32, so cast once for the whole batch
+        embeddings = embeddings.astype(np.float32, copy=False)
+        if len(unique_texts) < len(texts):
+            embeddings = embeddings[inverse]
         logger.info(f"Generated embeddings with shape {embeddings.shape}")
         return embeddings
 
-    def store_chunks_in_qdrant(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray, document_id: str):
-        """Store chunks with vectors and metadata (text, title, page, url) in Qdrant"""
+    def store_chunks_in_qdrant(
+        self, chunks: List[Dict[str, Any]], embeddings: np.ndarray, document_id: str, start_index: int = 0
+    ):
+        """Store chunks with vectors and metadata (text, title, page, url) in Qdrant, numbered from start_index"""
         logger.info(f"Storing {len(chunks)} chunks in Qdrant for document {document_id}")
 
-        points = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point_id_str = f"{document_id}_{idx}"
-            point_id = hash(point_id_str) % (2**63)
-
-            points.append(
-                PointStruct(
-                    id=point_id,
-                    vector=embedding.tolist(),
-                    payload={
-                        "text": chunk["text"],
-                        "document_id": document_id,
-                        "chunk_index": idx,
-                        "title": chunk["metadata"].get("title", ""),
-                        "page": chunk["metadata"].get("page", 0),
-                        "url": chunk["metadata"].get("url", ""),
-                    },
-                )
+        # UUIDv5 ids are stable across processes (hash() is salted per interpreter), so re-indexing a
+        # document overwrites its points instead of adding duplicates
+        ids = [
+            str(uuid.uuid5(uuid.NAMESPACE_URL, f"{document_id}:{idx}"))
+            for idx in range(start_index, start_index + len(chunks))
+        ]
+        payloads = [
+            {
+                "text": chunk["text"],
+                "document_id": document_id,
+                "chunk_index": idx,
+                "title": chunk["metadata"].get("title", ""),
+                "page": chunk["metadata"].get("page", 0),
+                "url": chunk["metadata"].get("url", ""),
+            }
+            for idx, chunk in enumerate(chunks, start_index)
+        ]
+        # Column-oriented Batch upserts (no PointStruct per chunk). wait=True returns only once the points
+        # are applied, so ChunksIndexed is never published before the document is searchable. qdrant-client
+        # 1.7.0 only takes vectors as Python lists here (its bulk uploader converts ndarrays the same way),
+        # so the whole batch is converted in one C-level tolist() call
+        vectors = embeddings.tolist()
+        for start in range(0, len(chunks), self.upsert_batch_size):
+            stop = start + self.upsert_batch_size
+            self.qdrant.upsert(
+                collection_name=self.collection_name,
+                points=Batch(ids=ids[start:stop], vectors=vectors[start:stop], payloads=payloads[start:stop]),
+                wait=True,
             )
-
-        self.qdrant.upsert(collection_name=self.collection_name, points=points)
-        logger.info(f"Successfully stored {len(points)} points in Qdrant")
+        logger.info(f"Successfully stored {len(chunks)} points in Qdrant")
 
     def _save_chunks(self, document_id: str, chunks: List[Dict[str, Any]]):
-        """Save chunks to storage/extracted/{documentId}/chunks.json for debugging"""
-        chunks_file = os.path.join(self.storage_path, document_id, "chunks.json")
+        """Save chunks to storage/extracted/{documentId}/chunks.jsonl for debugging (one chunk per line)"""
+        chunks_file = os.path.join(self.storage_path, document_id, "chunks.jsonl")
         logger.info(f"Saving {len(chunks)} chunks to {chunks_file}")
 
-        with open(chunks_file, "w", encoding="utf-8") as f:
-            json.dump(chunks, f, indent=2, ensure_ascii=False)
+        # Streamed line by line so the whole document is never rendered into one string
+        with open(chunks_file, "wb") as f:
+            for chunk in chunks:
+                f.write(orjson.dumps(chunk, default=dict, option=orjson.OPT_APPEND_NEWLINE))
 
         logger.info(f"Chunks saved to {chunks_file}")
 
@@ -250,10 +469,10 @@ class IndexingService:
             index_name=self.collection_name,
         )
 
-        self._save_event(document_id, event, "indexed.json")
-        self.event_broker.publish(routing_key=ROUTING_KEY_INDEXED, message=json.dumps(event))
+        self._save_in_background(self._save_event, document_id, event, "indexed.json")
+        self._queue_event(ROUTING_KEY_INDEXED, event)
 
-        logger.info(f"ChunksIndexed event published for document {document_id}")
+        logger.info(f"ChunksIndexed event queued for document {document_id}")
 
     def _publish_indexing_failed_event(self, original_event: Dict[str, Any], error_message: str):
         """Publish IndexingFailed event to RabbitMQ (routing_key: documents.indexing.failed)"""
@@ -266,25 +485,96 @@ class IndexingService:
                 document_id=document_id, correlation_id=correlation_id, error_message=error_message, error_type="IndexingError"
             )
 
-            self.event_broker.publish(routing_key=ROUTING_KEY_INDEXING_FAILED, message=json.dumps(event))
-            logger.info(f"IndexingFailed event published for document {document_id}")
+            self._queue_event(ROUTING_KEY_INDEXING_FAILED, event)
+            logger.info(f"IndexingFailed event queued for document {document_id}")
 
         except Exception as e:
             logger.error(f"Error publishing IndexingFailed event: {str(e)}", exc_info=True)
 
+    def _queue_event(self, routing_key: str, event: Dict[str, Any]):
+        """Persist the event to the outbox, then hand it to the sender thread"""
+        message = orjson.dumps(event)
+        os.makedirs(self.outbox_path, exist_ok=True)
+        # Nanosecond-prefixed names keep replay in publish order; the rename makes the entry appear whole
+        entry = os.path.join(self.outbox_path, f"{time.time_ns():020d}-{uuid.uuid4().hex}.json")
+        with open(f"{entry}.tmp", "wb") as f:
+            f.write(orjson.dumps({"routingKey": routing_key, "event": event}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{entry}.tmp", entry)
+        self._publish_queue.put((routing_key, message, entry))
+
+    def _replay_outbox(self):
+        """Queue events a previous process persisted but did not get to publish"""
+        if not os.path.isdir(self.outbox_path):
+            return
+        entries = sorted(name for name in os.listdir(self.outbox_path) if name.endswith(".json"))
+        for name in entries:
+            entry = os.path.join(self.outbox_path, name)
+            try:
+                with open(entry, "rb") as f:
+                    record = orjson.loads(f.read())
+                self._publish_queue.put((record["routingKey"], orjson.dumps(record["event"]), entry))
+            except Exception as e:
+                logger.error(f"Skipping unreadable outbox entry {entry}: {str(e)}")
+        if entries:
+            logger.info(f"Replaying {len(entries)} unpublished events from {self.outbox_path}")
+
+    def _run_publisher(self):
+        """Publish queued events in order until close() sends the stop marker"""
+        while True:
+            try:
+                item = self._publish_queue.get(timeout=PUBLISHER_IDLE_SECONDS)
+            except queue.Empty:
+                try:
+                    self.event_broker.connection.process_data_events(time_limit=0)
+                except Exception as e:
+                    logger.warning(f"RabbitMQ heartbeat processing failed: {str(e)}")
+                continue
+            if item is None:
+                return
+            routing_key, message, entry = item
+            try:
+                self.event_broker.publish(routing_key=routing_key, message=message)
+            except Exception as e:
+                # The outbox entry stays on disk and is resent on the next start
+                logger.error(f"Error publishing event to {routing_key}: {str(e)}", exc_info=True)
+                continue
+            try:
+                os.remove(entry)
+            except OSError as e:
+                logger.warning(f"Could not remove published outbox entry {entry}: {str(e)}")
+
+    def _save_in_background(self, save: Callable[..., None], *args: Any):
+        """Run a disk write on the I/O pool, logging (rather than raising) if it fails"""
+
+        def log_failure(future: Future):
+            if future.exception():
+                logger.error(f"Background save failed: {future.exception()}")
+
+        self.io_executor.submit(save, *args).add_done_callback(log_failure)
+
     def _save_event(self, document_id: str, event: Dict[str, Any], filename: str):
         """Save event to storage/extracted/{documentId}/{filename} for event sourcing and audit trail"""
         event_file = os.path.join(self.storage_path, document_id, filename)
         logger.info(f"Saving event to {event_file}")
 
-        with open(event_file, "w", encoding="utf-8") as f:
-            json.dump(event, f, indent=2, ensure_ascii=False)
+        with open(event_file, "wb") as f:
+            f.write(orjson.dumps(event, option=orjson.OPT_INDENT_2))
 
         logger.info(f"Event saved to {event_file}")
 
     def close(self):
         """Close RabbitMQ connection gracefully"""
         logger.info("Closing Indexing Service")
+        self.upload_executor.shutdown(wait=True)
+        self.io_executor.shutdown(wait=True)
+        # Drain queued events before the connection goes away. No timeout: the sender thread owns the
+        # connection until it exits, and pika connections must not be used from two threads at once
+        self._publish_queue.put(None)
+        self._publisher.join()
+        if self.encode_pool:
+            self.model.stop_multi_process_pool(self.encode_pool)
         if self.event_broker:
             self.event_broker.close()
         logger.info("Indexing Service closed")
@@ -25,6 +25,7 @@ sys.path.insert(0, str(project_root))
 
 from indexing_service import IndexingService
 
+from common.config import QUEUE_ARGUMENTS
 from common.health import start_health_server
 from common.logging_config import setup_logging
 from common.mq import RabbitMQEventBroker
@@ -126,6 +127,7 @@ if __name__ == "__main__":
             port=int(os.getenv("RABBITMQ_PORT", 5672)),  # What port?
             username=os.getenv("RABBITMQ_USER", "guest"),  # Login username
             password=os.getenv("RABBITMQ_PASSWORD", "guest"),  # Login password
+            queue_arguments=QUEUE_ARGUMENTS,  # Must match the other services' declarations of shared queues
         )
         logger.info("✅ Connected to RabbitMQ")
     except Exception as e:
@@ -256,7 +256,13 @@ class IngestionService:
             self._save_discovered_event(document_id, event)
 
             # Step 7: Publish event to RabbitMQ (triggers Extraction Service)
-            self.event_broker.publish(routing_key=ROUTING_KEY_DISCOVERED, message=json.dumps(event), exchange="events")
+            # documentId header keys the consistent-hash routing when the discovered queue is sharded
+            self.event_broker.publish(
+                routing_key=ROUTING_KEY_DISCOVERED,
+                message=json.dumps(event),
+                exchange="events",
+                headers={"documentId": document_id},
+            )
 
             logger.info(f"✅ Published event for: {pdf_info['title']}")
 
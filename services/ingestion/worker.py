@@ -21,7 +21,7 @@ sys.path.insert(0, str(project_root))
 
 from ingestion_service import IngestionService
 
-from common.config import MARP_URL, PDF_OUTPUT_DIR, STORAGE_PATH, get_rabbitmq_broker
+from common.config import DISCOVERED_SHARD_COUNT, MARP_URL, PDF_OUTPUT_DIR, STORAGE_PATH, get_rabbitmq_broker
 from common.events import ROUTING_KEY_DISCOVERED, ROUTING_KEY_INGESTION_FAILED
 from common.health import start_health_server
 from common.logging_config import setup_logging
@@ -44,13 +44,17 @@ if __name__ == "__main__":
     # Setup queues and exchange for event publishing
     try:
         # Create queues for DocumentDiscovered and IngestionFailed events
-        broker.declare_queue(ROUTING_KEY_DISCOVERED)
+        if DISCOVERED_SHARD_COUNT == 1:
+            broker.declare_queue(ROUTING_KEY_DISCOVERED)
         broker.declare_queue(ROUTING_KEY_INGESTION_FAILED)
 
         # Bind queues to exchange (topic routing)
         if broker.channel:
             broker.channel.exchange_declare(exchange="events", exchange_type="topic", durable=True)
-            broker.channel.queue_bind(exchange="events", queue=ROUTING_KEY_DISCOVERED, routing_key=ROUTING_KEY_DISCOVERED)
+            if DISCOVERED_SHARD_COUNT > 1:
+                broker.declare_sharded_queues(ROUTING_KEY_DISCOVERED, DISCOVERED_SHARD_COUNT)
+            else:
+                broker.channel.queue_bind(exchange="events", queue=ROUTING_KEY_DISCOVERED, routing_key=ROUTING_KEY_DISCOVERED)
             broker.channel.queue_bind(
                 exchange="events", queue=ROUTING_KEY_INGESTION_FAILED, routing_key=ROUTING_KEY_INGESTION_FAILED
             )
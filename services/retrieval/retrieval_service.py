@@ -9,6 +9,7 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 from retrieval_utils import create_qdrant_client, generate_query_embedding, load_embedding_model, search_similar_chunks
 
+from common.config import QUEUE_ARGUMENTS
 from common.events import ROUTING_KEY_RETRIEVAL_COMPLETED, create_retrieval_completed_event
 from common.mq import RabbitMQEventBroker
 
@@ -72,7 +73,7 @@ try:
     try:
         if _broker.channel:
             _broker.channel.exchange_declare(exchange="events", exchange_type="topic", durable=True)
-            _broker.channel.queue_declare(queue="retrieval.completed", durable=True)
+            _broker.channel.queue_declare(queue="retrieval.completed", durable=True, arguments=QUEUE_ARGUMENTS)
             _broker.channel.queue_bind(
                 exchange="events", queue="retrieval.completed", routing_key=ROUTING_KEY_RETRIEVAL_COMPLETED
             )
@@ -3,7 +3,7 @@
 import json
 import logging
 
-from common.config import get_rabbitmq_broker
+from common.config import QUEUE_ARGUMENTS, get_rabbitmq_broker
 from common.events import ROUTING_KEY_RETRIEVAL_COMPLETED
 
 # Logging is configured to show INFO-level messages with timestamps and a logger is created for this module.
@@ -32,7 +32,7 @@ if __name__ == "__main__":
     # Ensure queue and binding exist
     if broker.channel:
         broker.channel.exchange_declare(exchange="events", exchange_type="topic", durable=True)
-        broker.channel.queue_declare(queue=ROUTING_KEY_RETRIEVAL_COMPLETED, durable=True)
+        broker.channel.queue_declare(queue=ROUTING_KEY_RETRIEVAL_COMPLETED, durable=True, arguments=QUEUE_ARGUMENTS)
         broker.channel.queue_bind(
             exchange="events", queue=ROUTING_KEY_RETRIEVAL_COMPLETED, routing_key=ROUTING_KEY_RETRIEVAL_COMPLETED
         )
@@ -9,7 +9,11 @@ What this tests:
 """
 
 import json
+import socket
 import sys
+import time
+import urllib.error
+import urllib.request
 from datetime import datetime
 from pathlib import Path
 from unittest.mock import Mock
@@ -151,6 +155,14 @@ class TestEventHelpers:
         assert timestamp.endswith("Z")
         # Should be parseable
         assert "T" in timestamp
+        assert datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def test_get_utc_timestamp_is_monotonic_within_a_second(self):
+        """Test cached date prefix still yields increasing timestamps."""
+        first = events.get_utc_timestamp()
+        second = events.get_utc_timestamp()
+
+        assert first <= second
 
 
 class TestRoutingKeys:
@@ -189,5 +201,115 @@ class TestConfiguration:
         assert config.EMBEDDING_MODEL is not None
 
 
+class TestAckBatcher:
+    """Test that consumer acks are coalesced into multiple=True batches."""
+
+    def test_flushes_when_batch_is_full(self):
+        """Test a single multiple=True ack is sent once max_pending is reached."""
+        from common.mq import AckBatcher
+
+        channel = Mock()
+        batcher = AckBatcher(channel, max_pending=3)
+        for tag in (1, 2, 3):
+            batcher.track(tag)
+
+        batcher.ack(1)
+        batcher.ack(2)
+        channel.basic_ack.assert_not_called()
+
+        batcher.ack(3)
+        channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+        channel.connection.remove_timeout.assert_called_once()
+
+    def test_nack_flushes_pending_acks_first(self):
+        """Test pending acks are sent before a nack so no delivery is left unsettled."""
+        from common.mq import AckBatcher
+
+        channel = Mock()
+        batcher = AckBatcher(channel, max_pending=32)
+        batcher.track(1)
+        batcher.track(2)
+
+        batcher.ack(1)
+        batcher.nack(2, requeue=False)
+
+        assert channel.method_calls[-2:] == [
+            ("basic_ack", (), {"delivery_tag": 1, "multiple": True}),
+            ("basic_nack", (), {"delivery_tag": 2, "requeue": False}),
+        ]
+
+    def test_out_of_order_acks_only_cover_finished_deliveries(self):
+        """Test multiple=True acks stop below the oldest delivery still in flight."""
+        from common.mq import AckBatcher
+
+        channel = Mock()
+        batcher = AckBatcher(channel, max_pending=2)
+        for tag in (1, 2, 3):
+            batcher.track(tag)
+
+        # 2 and 3 finish first: nothing can be acked while 1 is still running
+        batcher.ack(3)
+        batcher.ack(2)
+        channel.basic_ack.assert_not_called()
+
+        batcher.ack(1)
+        channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+
+
+class TestHealthServer:
+    """Test the health check endpoint."""
+
+    def _get(self, port, path):
+        for _ in range(50):
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=2) as response:
+                    return response.status, json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+            except urllib.error.URLError:
+                time.sleep(0.05)  # server thread still starting
+        raise AssertionError("health server did not start")
+
+    def _free_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def test_health_reports_broker_state(self):
+        """Test 200 while the broker is connected and 503 once it is not."""
+        from common.health import start_health_server
+
+        broker = Mock()
+        broker.connection.is_closed = False
+        broker.channel.is_open = True
+        port = self._free_port()
+        start_health_server(broker, service_name="test-service", port=port, probe_cache_seconds=0)
+
+        status, body = self._get(port, "/health")
+        assert status == 200
+        assert body == {"status": "healthy", "service": "test-service", "rabbitmq": "connected"}
+
+        broker.connection.is_closed = True
+        status, _ = self._get(port, "/health")
+        assert status == 503
+
+        status, _ = self._get(port, "/other")
+        assert status == 404
+
+    def test_health_reuses_recent_probe(self):
+        """Test that probes inside the cache window skip the broker check."""
+        from common.health import start_health_server
+
+        broker = Mock()
+        broker.connection.is_closed = False
+        broker.channel.is_open = True
+        port = self._free_port()
+        start_health_server(broker, service_name="test-service", port=port, probe_cache_seconds=60)
+
+        assert self._get(port, "/health")[0] == 200
+        broker.connection.is_closed = True
+        assert self._get(port, "/health")[0] == 200
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -10,17 +10,19 @@ What this tests:
 
 import json
 import sys
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, Mock, mock_open, patch
 
 import pytest
+from pdfminer.psparser import LIT
 
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(project_root / "services" / "extraction"))
 
-from extraction_service import ExtractionService
+from extraction_service import ExtractionService, atomic_open
 
 
 class TestExtractionService:
@@ -47,12 +49,13 @@ class TestExtractionService:
         mock_pdfplumber.return_value = mock_pdf
 
         service = ExtractionService(storage_path="/tmp/storage")
-        result = service._extract_pdf_content("/tmp/test.pdf")
+        pages = []
+        result = service._extract_pdf_content("/tmp/test.pdf", on_page=pages.append)
 
         assert result["text_extracted"] is True
         assert result["page_count"] == 2
-        assert len(result["pages"]) == 2
-        assert result["pages"][0]["text"] == "Page 1 content"
+        assert len(pages) == 2
+        assert pages[0]["text"] == "Page 1 content"
         assert result["metadata"]["title"] == "Test Document"
 
     @patch("extraction_service.pdfplumber.open")
@@ -71,11 +74,95 @@ class TestExtractionService:
         mock_pdfplumber.return_value = mock_pdf
 
         service = ExtractionService(storage_path="/tmp/storage")
-        result = service._extract_pdf_content("/tmp/test.pdf")
+        pages = []
+        result = service._extract_pdf_content("/tmp/test.pdf", on_page=pages.append)
 
         # Should mark text_extracted as False
         assert result["text_extracted"] is False
-        assert "note" in result["pages"][0]
+        assert "note" in pages[0]
+
+    @patch("extraction_service.pdfplumber.open")
+    def test_extract_pdf_opens_large_documents_in_page_ranges(self, mock_pdfplumber):
+        """Test that long PDFs are processed one page range at a time."""
+        all_pages = []
+        for i in range(5):
+            page = Mock()
+            page.extract_text.return_value = f"Page {i + 1} content"
+            all_pages.append(page)
+
+        def open_pdf(path, pages=None):
+            mock_pdf = Mock()
+            mock_pdf.pages = all_pages if pages is None else [all_pages[n - 1] for n in pages]
+            mock_pdf.metadata = {}
+            mock_pdf.__enter__ = Mock(return_value=mock_pdf)
+            mock_pdf.__exit__ = Mock(return_value=False)
+            return mock_pdf
+
+        mock_pdfplumber.side_effect = open_pdf
+
+        service = ExtractionService(storage_path="/tmp/storage")
+        service.page_batch_size = 2
+        pages = []
+        result = service._extract_pdf_content("/tmp/test.pdf", on_page=pages.append)
+
+        assert result["page_count"] == 5
+        assert [p["page"] for p in pages] == [1, 2, 3, 4, 5]
+        assert pages[4]["text"] == "Page 5 content"
+        # One metadata probe + three page ranges (1-2, 3-4, 5)
+        range_calls = [c.kwargs["pages"] for c in mock_pdfplumber.call_args_list[1:]]
+        assert range_calls == [[1, 2], [3, 4], [5]]
+
+    @patch("extraction_service.pdfplumber.open")
+    def test_extract_pdf_times_out_slow_pages(self, mock_pdfplumber):
+        """Test that a page exceeding the per-page timeout fails the whole document."""
+        slow_page = Mock()
+        slow_page.extract_text.side_effect = lambda: time.sleep(1) or "too late"
+        fast_page = Mock()
+        fast_page.extract_text.return_value = "Page 2 content"
+
+        mock_pdf = Mock()
+        mock_pdf.pages = [slow_page, fast_page]
+        mock_pdf.metadata = {}
+        mock_pdf.__enter__ = Mock(return_value=mock_pdf)
+        mock_pdf.__exit__ = Mock(return_value=False)
+
+        mock_pdfplumber.return_value = mock_pdf
+
+        service = ExtractionService(storage_path="/tmp/storage")
+        service.page_timeout = 0.05
+        pages = []
+        with pytest.raises(TimeoutError):
+            service._extract_pdf_content("/tmp/test.pdf", on_page=pages.append)
+
+        # Extraction stops at the slow page instead of reusing the shared handle
+        assert pages == []
+        fast_page.extract_text.assert_not_called()
+
+    @patch("extraction_service.pdfplumber.open")
+    def test_extract_pdf_skips_image_only_pages(self, mock_pdfplumber):
+        """Test that scanned (image-only) pages skip text extraction."""
+        image = Mock()
+        image.get.return_value = LIT("Image")
+
+        mock_page = Mock()
+        mock_page.page_obj.resources = {"XObject": {"Im0": image}}
+
+        mock_pdf = Mock()
+        mock_pdf.pages = [mock_page]
+        mock_pdf.metadata = {}
+        mock_pdf.__enter__ = Mock(return_value=mock_pdf)
+        mock_pdf.__exit__ = Mock(return_value=False)
+
+        mock_pdfplumber.return_value = mock_pdf
+
+        service = ExtractionService(storage_path="/tmp/storage")
+        pages = []
+        result = service._extract_pdf_content("/tmp/test.pdf", on_page=pages.append)
+
+        mock_page.extract_text.assert_not_called()
+        assert result["text_extracted"] is False
+        assert pages[0]["text"] == ""
+        assert "note" in pages[0]
 
     def test_extract_year_from_metadata(self):
         """Test year extraction from PDF metadata."""
@@ -92,8 +179,7 @@ class TestExtractionService:
     @patch("extraction_service.ExtractionService._extract_pdf_content")
     @patch("extraction_service.ExtractionService._save_extracted_content")
     @patch("extraction_service.ExtractionService._save_event")
-    @patch("builtins.open", new_callable=mock_open, read_data='{"payload": {"documentId": "test"}}')
-    def test_extract_document_success(self, mock_file, mock_save_event, mock_save_content, mock_extract):
+    def test_extract_document_success(self, mock_save_event, mock_save_content, mock_extract, tmp_path):
         """Test complete document extraction process."""
         mock_broker = Mock()
 
@@ -101,14 +187,13 @@ class TestExtractionService:
         mock_extract.return_value = {
             "text_extracted": True,
             "page_count": 10,
-            "pages": [{"page": 1, "text": "content"}],
             "metadata": {"title": "Test", "author": "Author"},
             "extraction_method": "pdfplumber",
         }
 
         mock_save_content.return_value = "/tmp/storage/test/pages.jsonl"
 
-        service = ExtractionService(event_broker=mock_broker, storage_path="/tmp/storage")
+        service = ExtractionService(event_broker=mock_broker, storage_path=str(tmp_path))
 
         event = {
             "correlationId": "corr-123",
@@ -126,6 +211,59 @@ class TestExtractionService:
         assert result["eventType"] == "DocumentExtracted"
         assert result["payload"]["documentId"] == "test-doc"
         assert result["payload"]["pageCount"] == 10
+        # Pages are streamed to disk through the on_page callback
+        assert callable(mock_extract.call_args.kwargs["on_page"])
+        assert (tmp_path / "test-doc" / "pages.jsonl").exists()
+
+    @patch("extraction_service.ExtractionService._extract_pdf_content")
+    def test_extract_document_reuses_cached_extraction(self, mock_extract, tmp_path):
+        """Test that identical PDF bytes are only extracted once."""
+        pdf_path = tmp_path / "test.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 fake content")
+
+        def extract(path, on_page):
+            on_page({"page": 1, "text": "content"})
+            return {
+                "text_extracted": True,
+                "page_count": 1,
+                "metadata": {"title": "Test", "author": "Author"},
+                "extraction_method": "pdfplumber",
+            }
+
+        mock_extract.side_effect = extract
+
+        service = ExtractionService(storage_path=str(tmp_path / "storage"))
+
+        first = service.extract_document({"correlationId": "corr-1", "payload": {"documentId": "doc-a", "url": str(pdf_path)}})
+        second = service.extract_document(
+            {"correlationId": "corr-2", "payload": {"documentId": "doc-b", "url": str(pdf_path)}}
+        )
+
+        # Second document should be served from the cache
+        assert mock_extract.call_count == 1
+        assert second["payload"]["pageCount"] == first["payload"]["pageCount"] == 1
+        pages = (tmp_path / "storage" / "doc-b" / "pages.jsonl").read_text(encoding="utf-8").splitlines()
+        assert json.loads(pages[0]) == {"documentId": "doc-b", "page": 1, "text": "content"}
+
+    @patch("extraction_service.ExtractionService._extract_pdf_content")
+    def test_extract_document_does_not_cache_page_errors(self, mock_extract, tmp_path):
+        """Test that extractions with failed pages are re-extracted next time."""
+        pdf_path = tmp_path / "test.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 fake content")
+
+        def extract(path, on_page):
+            on_page({"page": 1, "text": "", "error": "transient failure"})
+            return {"text_extracted": False, "page_count": 1, "metadata": {}, "extraction_method": "pdfplumber"}
+
+        mock_extract.side_effect = extract
+
+        service = ExtractionService(storage_path=str(tmp_path / "storage"))
+
+        service.extract_document({"correlationId": "corr-1", "payload": {"documentId": "doc-a", "url": str(pdf_path)}})
+        service.extract_document({"correlationId": "corr-2", "payload": {"documentId": "doc-b", "url": str(pdf_path)}})
+
+        assert mock_extract.call_count == 2
+        assert not (tmp_path / "storage" / ".cache").exists()
 
     @patch("extraction_service.ExtractionService._extract_pdf_content")
     def test_handle_document_discovered_event_error(self, mock_extract):
@@ -148,5 +286,34 @@ class TestExtractionService:
         assert mock_broker.publish.called
 
 
+class TestAtomicWrites:
+    """Test crash-safe output files."""
+
+    def test_atomic_open_keeps_previous_file_on_failure(self, tmp_path):
+        """Test that a failed write leaves the previous file untouched."""
+        target = tmp_path / "pages.jsonl"
+        target.write_text("old\n", encoding="utf-8")
+
+        with pytest.raises(RuntimeError):
+            with atomic_open(target) as f:
+                f.write("partial")
+                raise RuntimeError("crash mid-write")
+
+        assert target.read_text(encoding="utf-8") == "old\n"
+        assert [p.name for p in tmp_path.iterdir()] == ["pages.jsonl"]
+
+    @patch("extraction_service.os.link", side_effect=OSError(18, "Invalid cross-device link"))
+    def test_link_file_copies_when_hardlink_fails(self, mock_link, tmp_path):
+        """Test that cache staging falls back to a copy across filesystems."""
+        src = tmp_path / "src.jsonl"
+        src.write_text("page\n", encoding="utf-8")
+        dst = tmp_path / "dst.jsonl"
+
+        ExtractionService._link_file(src, dst)
+
+        assert dst.read_text(encoding="utf-8") == "page\n"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["dst.jsonl", "src.jsonl"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -10,6 +10,7 @@ What this tests:
 
 import json
 import sys
+import uuid
 from pathlib import Path
 from unittest.mock import MagicMock, Mock, mock_open, patch
 
@@ -24,6 +25,11 @@ sys.path.insert(0, str(project_root / "services" / "indexing"))
 from indexing_service import IndexingService
 
 
+def char_offsets(*texts):
+    """Fake fast-tokenizer output that treats every character as one token."""
+    return {"offset_mapping": [[(i, i + 1) for i in range(len(text))] for text in texts]}
+
+
 class TestChunking:
     """Test document chunking functionality."""
 
@@ -32,17 +38,16 @@ class TestChunking:
     @patch("indexing_service.RabbitMQEventBroker")
     def test_chunk_document(self, mock_broker, mock_model, mock_qdrant):
         """Test token-based document chunking."""
-        # Mock tokenizer
+        text = "This is a long text " * 100  # Long text
+
+        # Mock tokenizer: one token per character
         mock_tokenizer = Mock()
-        # Simulate encoding text to tokens
-        mock_tokenizer.encode.return_value = list(range(500))  # 500 tokens
-        mock_tokenizer.decode.side_effect = lambda tokens, **kwargs: f"Chunk with {len(tokens)} tokens"
+        mock_tokenizer.return_value = char_offsets(text)
 
         mock_model.return_value.tokenizer = mock_tokenizer
 
         service = IndexingService()
 
-        text = "This is a long text " * 100  # Long text
         metadata = {"title": "Test", "page": 1, "url": "http://example.com"}
 
         chunks = service.chunk_document(text, metadata, max_tokens=200, overlap_tokens=50)
@@ -54,22 +59,25 @@ class TestChunking:
             assert "text" in chunk
             assert "metadata" in chunk
             assert chunk["metadata"]["title"] == "Test"
+        # Chunks of one page share a single read-only metadata mapping
+        assert all(chunk["metadata"] is chunks[0]["metadata"] for chunk in chunks)
+        with pytest.raises(TypeError):
+            chunks[0]["metadata"]["title"] = "Changed"
 
     @patch("indexing_service.QdrantClient")
     @patch("indexing_service.SentenceTransformer")
     @patch("indexing_service.RabbitMQEventBroker")
     def test_chunk_document_overlap(self, mock_broker, mock_model, mock_qdrant):
         """Test that chunks have proper overlap."""
-        mock_tokenizer = Mock()
         # 250 tokens total
-        mock_tokenizer.encode.return_value = list(range(250))
-        mock_tokenizer.decode.side_effect = lambda tokens, **kwargs: f"Chunk_{len(tokens)}"
+        text = "abcdefghij" * 25
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = char_offsets(text)
 
         mock_model.return_value.tokenizer = mock_tokenizer
 
         service = IndexingService()
 
-        text = "Test text"
         metadata = {"title": "Test", "page": 1}
 
         # max_tokens=200, overlap=50
@@ -78,6 +86,49 @@ class TestChunking:
 
         # Should have at least 2 chunks due to overlap
         assert len(chunks) >= 2
+        # Windows start every max_tokens - overlap tokens and are sliced from the original text
+        assert [chunk["text"] for chunk in chunks] == [text[0:200], text[150:250]]
+
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_chunk_pages_batches_tokenization(self, mock_broker, mock_model, mock_qdrant):
+        """Test that several pages are tokenized in one call and keep their own metadata."""
+        texts = ["a" * 250, "b" * 100]
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = char_offsets(*texts)
+
+        mock_model.return_value.tokenizer = mock_tokenizer
+
+        service = IndexingService()
+
+        chunks = service.chunk_pages(texts, [{"page": 1}, {"page": 2}], max_tokens=200, overlap_tokens=50)
+
+        # One tokenizer call for both pages, and chunk text is sliced rather than decoded
+        mock_tokenizer.assert_called_once()
+        mock_tokenizer.batch_decode.assert_not_called()
+        assert [(chunk["text"], chunk["metadata"]["page"]) for chunk in chunks] == [
+            ("a" * 200, 1),
+            ("a" * 100, 1),
+            ("b" * 100, 2),
+        ]
+
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_chunk_pages_tokenizes_repeated_pages_once(self, mock_broker, mock_model, mock_qdrant):
+        """Test that identical page texts are tokenized once but still chunked per page."""
+        mock_tokenizer = Mock()
+        mock_tokenizer.side_effect = lambda texts, **kwargs: char_offsets(*texts)
+
+        mock_model.return_value.tokenizer = mock_tokenizer
+
+        service = IndexingService()
+
+        chunks = service.chunk_pages(["Form", "Body", "Form"], [{"page": 1}, {"page": 2}, {"page": 3}])
+
+        assert mock_tokenizer.call_args[0][0] == ["Form", "Body"]
+        assert [(chunk["text"], chunk["metadata"]["page"]) for chunk in chunks] == [("Form", 1), ("Body", 2), ("Form", 3)]
 
 
 class TestEmbeddings:
@@ -102,6 +153,24 @@ class TestEmbeddings:
         # Should call model.encode
         mock_model.return_value.encode.assert_called_once()
 
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_generate_embeddings_dedups_repeated_text(self, mock_broker, mock_model, mock_qdrant):
+        """Test that repeated chunk texts are encoded once and fanned back out."""
+        mock_model.return_value.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+        service = IndexingService()
+
+        embeddings = service.generate_embeddings(["Header", "Body", "Header"])
+
+        # Only the distinct texts reach the model
+        assert mock_model.return_value.encode.call_args[0][0] == ["Header", "Body"]
+        # Output keeps one row per input text, in input order
+        assert embeddings.shape == (3, 2)
+        assert (embeddings[0] == embeddings[2]).all()
+        assert (embeddings[1] == [0.0, 1.0]).all()
+
 
 class TestQdrantStorage:
     """Test Qdrant vector storage."""
@@ -128,25 +197,69 @@ class TestQdrantStorage:
 
         service.store_chunks_in_qdrant(chunks, embeddings, "test-doc")
 
-        # Should call qdrant.upsert
+        # Should upsert one batch and wait for it to be applied
         service.qdrant.upsert.assert_called_once()
-
-        # Check the points structure
         call_args = service.qdrant.upsert.call_args
-        points = call_args[1]["points"]
+        assert call_args[1]["wait"] is True
+
+        # Check the payload structure
+        payloads = call_args[1]["points"].payloads
+        ids = call_args[1]["points"].ids
+
+        assert len(payloads) == 2
+        assert len(set(ids)) == 2
+        # Point ids are deterministic so re-indexing overwrites instead of duplicating
+        assert ids[0] == str(uuid.uuid5(uuid.NAMESPACE_URL, "test-doc:0"))
+        assert payloads[0]["text"] == "Chunk 1 text"
+        assert payloads[0]["document_id"] == "test-doc"
+        assert payloads[0]["title"] == "Test Doc"
+        assert payloads[0]["page"] == 1
+
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_existing_collection_gets_quantization(self, mock_broker, mock_model, mock_qdrant):
+        """Test that an existing unquantized collection is updated instead of recreated."""
+        existing = Mock()
+        existing.name = "marp-documents"
+        mock_qdrant.return_value.get_collections.return_value.collections = [existing]
+        mock_qdrant.return_value.get_collection.return_value.config.quantization_config = None
 
-        assert len(points) == 2
-        assert points[0].payload["text"] == "Chunk 1 text"
-        assert points[0].payload["document_id"] == "test-doc"
-        assert points[0].payload["title"] == "Test Doc"
-        assert points[0].payload["page"] == 1
+        service = IndexingService()
+
+        service.qdrant.create_collection.assert_not_called()
+        service.qdrant.update_collection.assert_called_once()
+        assert service.qdrant.update_collection.call_args[1]["collection_name"] == "marp-documents"
+
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_save_chunks_writes_jsonl(self, mock_broker, mock_model, mock_qdrant, tmp_path):
+        """Test that chunks with shared metadata are written one JSON object per line."""
+        (tmp_path / "test-doc").mkdir()
+        service = IndexingService()
+        service.storage_path = str(tmp_path)
+
+        text = "x" * 250
+        mock_tokenizer = Mock()
+        mock_tokenizer.return_value = char_offsets(text)
+        service.model.tokenizer = mock_tokenizer
+        chunks = service.chunk_document(text, {"title": "Test", "page": 1})
+
+        service._save_chunks("test-doc", chunks)
+
+        lines = (tmp_path / "test-doc" / "chunks.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"text": "x" * 200, "metadata": {"title": "Test", "page": 1}},
+            {"text": "x" * 100, "metadata": {"title": "Test", "page": 1}},
+        ]
 
 
 class TestEventHandling:
     """Test event processing."""
 
     @patch("indexing_service.IndexingService._read_pages")
-    @patch("indexing_service.IndexingService.chunk_document")
+    @patch("indexing_service.IndexingService.chunk_pages")
     @patch("indexing_service.IndexingService.generate_embeddings")
     @patch("indexing_service.IndexingService.store_chunks_in_qdrant")
     @patch("indexing_service.IndexingService._save_chunks")
@@ -170,11 +283,8 @@ class TestEventHandling:
         # Mock pages from storage
         mock_read_pages.return_value = [{"page": 1, "text": "Page 1 content"}, {"page": 2, "text": "Page 2 content"}]
 
-        # Mock chunking (2 pages, 3 chunks each)
-        mock_chunk.side_effect = [
-            [{"text": "Chunk 1", "metadata": {}}] * 3,  # Page 1
-            [{"text": "Chunk 2", "metadata": {}}] * 3,  # Page 2
-        ]
+        # Mock chunking (2 pages, 3 chunks each, chunked together in one batch)
+        mock_chunk.return_value = [{"text": "Chunk 1", "metadata": {}}] * 3 + [{"text": "Chunk 2", "metadata": {}}] * 3
 
         # Mock embeddings
         mock_embeddings.return_value = np.random.rand(6, 384)
@@ -194,14 +304,94 @@ class TestEventHandling:
 
         # Should process pages
         mock_read_pages.assert_called_once_with("test-doc")
-        # Should chunk each page
-        assert mock_chunk.call_count == 2
+        # Should chunk both pages in one batched call
+        mock_chunk.assert_called_once()
+        assert mock_chunk.call_args[0][0] == ["Page 1 content", "Page 2 content"]
+        assert [metadata["page"] for metadata in mock_chunk.call_args[0][1]] == [1, 2]
         # Should generate embeddings for all chunks
         mock_embeddings.assert_called_once()
         # Should store in Qdrant
         mock_store.assert_called_once()
         # Should publish success event
         mock_publish.assert_called_once_with("test-doc", "corr-123", 6)
+        # Debug chunk dump is off unless DEBUG_SAVE_CHUNKS=1
+        mock_save_chunks.assert_not_called()
+
+    @patch("indexing_service.IndexingService._read_pages")
+    @patch("indexing_service.IndexingService.generate_embeddings")
+    @patch("indexing_service.IndexingService.store_chunks_in_qdrant")
+    @patch("indexing_service.IndexingService._save_chunks")
+    @patch("indexing_service.IndexingService.publish_chunks_indexed_event")
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_handle_event_pipelines_batches(
+        self,
+        mock_broker,
+        mock_model,
+        mock_qdrant,
+        mock_publish,
+        mock_save_chunks,
+        mock_store,
+        mock_embeddings,
+        mock_read_pages,
+    ):
+        """Test that chunks are embedded and stored in pipeline batches with running indices."""
+        mock_read_pages.return_value = [{"page": 1, "text": "Page 1 content"}]
+        mock_embeddings.side_effect = lambda texts: np.random.rand(len(texts), 384)
+
+        service = IndexingService()
+        service.pipeline_batch_size = 2
+        service.chunk_pages = Mock(return_value=[{"text": f"Chunk {i}", "metadata": {}} for i in range(3)])
+
+        event = {"correlationId": "corr-123", "payload": {"documentId": "test-doc", "metadata": {}}}
+        service.handle_document_extracted_event(event)
+
+        # Two batches: chunks 0-1, then chunk 2 numbered from index 2
+        assert mock_embeddings.call_count == 2
+        assert [call[0][3] for call in mock_store.call_args_list] == [0, 2]
+        assert len(mock_store.call_args_list[1][0][0]) == 1
+        mock_publish.assert_called_once_with("test-doc", "corr-123", 3)
+
+
+class TestEventOutbox:
+    """Test that outgoing events survive a crash before they are published."""
+
+    @patch("indexing_service.IndexingService._run_publisher")
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_event_is_persisted_before_queueing(self, mock_broker, mock_model, mock_qdrant, mock_run_publisher, tmp_path):
+        """Test that an event is in the outbox by the time the handler could ack."""
+        service = IndexingService()
+        service.outbox_path = str(tmp_path / ".outbox")
+
+        service._queue_event("documents.indexed", {"payload": {"documentId": "test-doc"}})
+
+        entries = list((tmp_path / ".outbox").iterdir())
+        assert len(entries) == 1
+        assert json.loads(entries[0].read_text())["routingKey"] == "documents.indexed"
+        routing_key, message, entry = service._publish_queue.get_nowait()
+        assert routing_key == "documents.indexed"
+        assert json.loads(message) == {"payload": {"documentId": "test-doc"}}
+        assert entry == str(entries[0])
+
+    @patch("indexing_service.IndexingService._run_publisher")
+    @patch("indexing_service.QdrantClient")
+    @patch("indexing_service.SentenceTransformer")
+    @patch("indexing_service.RabbitMQEventBroker")
+    def test_unsent_events_are_replayed_at_startup(self, mock_broker, mock_model, mock_qdrant, mock_run_publisher, tmp_path):
+        """Test that outbox entries left by a previous process are queued again in order."""
+        outbox = tmp_path / ".outbox"
+        outbox.mkdir()
+        (outbox / "00000000000000000002-b.json").write_text(json.dumps({"routingKey": "second", "event": {}}))
+        (outbox / "00000000000000000001-a.json").write_text(json.dumps({"routingKey": "first", "event": {}}))
+
+        with patch.dict("os.environ", {"STORAGE_PATH": str(tmp_path)}):
+            service = IndexingService()
+
+        assert service._publish_queue.get_nowait()[0] == "first"
+        assert service._publish_queue.get_nowait()[0] == "second"
 
 
 if __name__ == "__main__":